@@ -7,5 +7,6 @@
 from .bindings import PyQtBindings
 from .builder import QmakeBuilder
 from .installable import QmakeTargetInstallable
+from .ninja_builder import NinjaBuilder
 from .project import PyQtProject
 from .version import PYQTBUILD_VERSION, PYQTBUILD_VERSION_STR
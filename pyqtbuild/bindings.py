@@ -9,6 +9,8 @@ import sys
 
 from sipbuild import Bindings, BuildableExecutable, UserException, Option
 
+from .cache import BuildCache
+
 
 class PyQtBindings(Bindings):
     """ A base class for all PyQt-based bindings. """
@@ -53,6 +55,11 @@ class PyQtBindings(Bindings):
             self.tags = ['{}_{}'.format(project.tag_prefix,
                     project.builder.qt_version_tag)]
 
+        # For a unity build the generated code is concatenated into as many
+        # source files as there are make jobs unless explicitly specified.
+        if self.concatenate is None and self.project.builder.unity_build:
+            self.concatenate = self.project.builder.jobs
+
         super().apply_user_defaults(tool)
 
     def get_options(self):
@@ -98,6 +105,53 @@ class PyQtBindings(Bindings):
     def is_buildable(self):
         """ Return True of the bindings are buildable. """
 
+        test = self._create_test()
+        if test is None:
+            # There is no test program so defer to the super-class.
+            return super().is_buildable()
+
+        return self._evaluate_test(test, self._run_test(test))
+
+    @staticmethod
+    def _add_qt_bin_dir_to_path(project):
+        """ Make sure the Qt DLLs get picked up by test programs.  Return the
+        original value of PATH if it was changed, otherwise None.
+        """
+
+        original_path = None
+
+        if sys.platform == 'win32':
+            qt_bin_dir = os.path.dirname(project.builder.qmake)
+            path = os.environ['PATH']
+            path_parts = path.split(os.path.pathsep)
+
+            if qt_bin_dir not in path_parts:
+                original_path = path
+
+                path_parts.insert(0, qt_bin_dir)
+                os.environ['PATH'] = os.pathsep.join(path_parts)
+
+        return original_path
+
+    def _cache_test_output(self, test, test_output):
+        """ Cache the output of a test program.  Only the outcomes of test
+        programs that were built are cached as a failure to build may be
+        transient.
+        """
+
+        _, _, cache_key = test
+
+        if cache_key is not None:
+            self.project.builder.build_cache.set('config-tests', cache_key,
+                    {'test_output': test_output})
+
+    def _create_test(self):
+        """ Create the buildable for any test program and return it, a flag
+        that is set if the test program should be run and the key used to
+        cache the outcome of the test.  None is returned if there is no test
+        program.
+        """
+
         project = self.project
 
         test = 'cfgtest_' + self.name
@@ -107,13 +161,15 @@ class PyQtBindings(Bindings):
         if os.path.isfile(test_source_path):
             # There is an external test program that should be run.
             run_test = True
+
+            with open(test_source_path) as f:
+                source_text = f.read()
         elif self.test_statement:
             # There is an internal test program that doesn't need to be run.
             test_source_path = None
             run_test = False
         else:
-            # There is no test program so defer to the super-class.
-            return super().is_buildable()
+            return None
 
         self.project.progress(
                 "Checking to see if the {0} bindings can be built".format(
@@ -148,14 +204,94 @@ int main(int, char **)
 
         buildable.sources.append(test_source_path)
 
+        # The outcome of the test only depends on the following.
+        builder = project.builder
+
+        if builder.build_cache is not None:
+            cache_key = BuildCache.key(source_text, run_test,
+                    buildable.builder_settings, buildable.debug,
+                    buildable.define_macros, buildable.include_dirs,
+                    buildable.libraries, buildable.library_dirs,
+                    builder.qmake_settings, builder.spec,
+                    builder.qt_configuration)
+        else:
+            cache_key = None
+
+        return buildable, run_test, cache_key
+
+    def _evaluate_test(self, test, test_output):
+        """ Return True if the bindings are buildable given the output of a
+        test program.
+        """
+
+        _, run_test, _ = test
+
+        # The test program couldn't be built.
+        if test_output is None:
+            return False
+
+        # If the test didn't need to be run then we are done.
+        if not run_test:
+            return True
+
+        return self.handle_test_output(test_output)
+
+    def _get_cached_test_output(self, test):
+        """ Return the cached entry containing the output of a test program or
+        None if there is no such entry.
+        """
+
+        _, _, cache_key = test
+
+        if cache_key is None:
+            return None
+
+        return self.project.builder.build_cache.get('config-tests', cache_key)
+
+    @staticmethod
+    def _matching_files(pattern):
+        """ Return a reproducable list of files that match a pattern. """
+
+        return sorted(glob.glob(pattern))
+
+    def _run_test(self, test):
+        """ Build and, if required, run a test program.  Return the output as a
+        list of lines or None if the program couldn't be built.  This may be
+        called from any thread.
+        """
+
+        # See if the outcome of the test has been cached.
+        cached = self._get_cached_test_output(test)
+        if cached is not None:
+            return cached['test_output']
+
+        builder = self.project.builder
+        buildable, _, _ = test
+
         # Build the test program.
-        test_exe = project.builder.build_executable(buildable, fatal=False)
+        with builder.build_trace.span(
+                "Building the {0} configuration test".format(self.name),
+                'config-test'):
+            test_exe = builder.build_executable(buildable, fatal=False)
+
+        return self._run_test_program(test, test_exe)
+
+    def _run_test_program(self, test, test_exe):
+        """ Run a test program, if required, that has already been built.
+        Return the output as a list of lines or None if the program wasn't
+        built.  This may be called from any thread.
+        """
+
+        project = self.project
+        buildable, run_test, _ = test
+
         if test_exe is None:
-            return False
+            return None
 
         # If the test doesn't need to be run then we are done.
         if not run_test:
-            return True
+            self._cache_test_output(test, [])
+            return []
 
         # Run the test and capture the output as a list of lines.
         test_exe = os.path.join(buildable.build_dir, test_exe)
@@ -163,7 +299,7 @@ int main(int, char **)
         # Create the output file, first making sure it doesn't exist.  Note
         # that we don't use a pipe because we may want a copy of the output for
         # debugging purposes.
-        out_file = os.path.join(buildable.build_dir, test + '.out')
+        out_file = os.path.join(buildable.build_dir, buildable.target + '.out')
 
         try:
             os.remove(out_file)
@@ -171,20 +307,12 @@ int main(int, char **)
             pass
 
         # Make sure the Qt DLLs get picked up.
-        original_path = None
-
-        if sys.platform == 'win32':
-            qt_bin_dir = os.path.dirname(project.builder.qmake)
-            path = os.environ['PATH']
-            path_parts = path.split(os.path.pathsep)
-
-            if qt_bin_dir not in path_parts:
-                original_path = path
-
-                path_parts.insert(0, qt_bin_dir)
-                os.environ['PATH'] = os.pathsep.join(path_parts)
+        original_path = self._add_qt_bin_dir_to_path(project)
 
-        self.project.run_command([test_exe, out_file], fatal=False)
+        with project.builder.build_trace.span(
+                "Running the {0} configuration test".format(self.name),
+                'config-test'):
+            project.run_command([test_exe, out_file], fatal=False)
 
         if original_path is not None:
             os.environ['PATH'] = original_path
@@ -198,14 +326,9 @@ int main(int, char **)
             test_output = f.read().strip()
 
         test_output = test_output.split('\n') if test_output else []
+        self._cache_test_output(test, test_output)
 
-        return self.handle_test_output(test_output)
-
-    @staticmethod
-    def _matching_files(pattern):
-        """ Return a reproducable list of files that match a pattern. """
-
-        return sorted(glob.glob(pattern))
+        return test_output
 
     def _update_builder_settings(self, name, modifications):
         """ Update the builder settings with a list of modifications to a
@@ -3,16 +3,34 @@
 # Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
 
 
+import base64
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import filecmp
+import glob
+import hashlib
+import json
+import locale
 import os
+import re
+import shutil
+import subprocess
 import sys
+import threading
 
 from sipbuild import (Buildable, BuildableModule, Builder, Option, Project,
         PyProjectOptionException, UserException)
 
+from .cache import BuildCache
 from .installable import QmakeTargetInstallable
+from .trace import BuildTrace
 from .version import PYQTBUILD_VERSION_STR
 
 
+# The size of the chunks in which installed files are read.
+_CHUNK_SIZE = 1024 * 1024
+
+
 class QmakeBuilder(Builder):
     """ A project builder that uses qmake as the underlying build system. """
 
@@ -28,6 +46,13 @@ class QmakeBuilder(Builder):
         # Assume for the moment that this will be found on PATH.
         self._sip_distinfo = 'sip-distinfo'
 
+        self.build_cache = None
+        self.build_trace = BuildTrace()
+
+        self._module_durations = {}
+        self._output_lock = threading.Lock()
+        self._previous_build_dir = None
+
     def apply_user_defaults(self, tool):
         """ Set default values for user options that haven't been set yet. """
 
@@ -54,9 +79,62 @@ class QmakeBuilder(Builder):
 
             self.qmake = self._quote(os.path.abspath(self.qmake))
 
+            # The current directory will change before these are written.
+            if self.compile_report:
+                self.compile_report = os.path.abspath(self.compile_report)
+
+            if self.trace:
+                self.trace = os.path.abspath(self.trace)
+
+            # Find any compiler launcher.
+            if self.compiler_launcher == 'auto':
+                for launcher in ('ccache', 'sccache'):
+                    self.compiler_launcher = self._find_exe(launcher)
+                    if self.compiler_launcher is not None:
+                        break
+            elif self.compiler_launcher:
+                if not self._is_exe(self.compiler_launcher):
+                    launcher = self._find_exe(self.compiler_launcher)
+                    if launcher is None:
+                        raise PyProjectOptionException('compiler-launcher',
+                                "'{0}' could not be found".format(
+                                        self.compiler_launcher))
+
+                    self.compiler_launcher = launcher
+
+            # By default run as many jobs as there are CPUs that the build can
+            # actually use (which may be far fewer than the number of CPUs in
+            # the machine if the build is running in a container).
+            if not self.jobs:
+                self.jobs = self._get_usable_cpu_count()
+
+            # Create the cache of build information.  Note that this is done
+            # before the defaults of the user options have been applied.
+            if self.cache is not False:
+                cache_dir = self.cache_dir
+                if not cache_dir:
+                    cache_dir = BuildCache.default_dir()
+
+                self.build_cache = BuildCache(cache_dir)
+
+                if self.clear_cache:
+                    self.build_cache.clear()
+                else:
+                    cache_size = self.cache_size
+                    if cache_size is None:
+                        cache_size = 100
+
+                    self.build_cache.evict(cache_size * 1024 * 1024)
+
             # Use qmake to get the Qt configuration.
             self._get_qt_configuration()
 
+            # The build directory is about to be removed so, for an
+            # incremental build, move it out of the way so that the unchanged
+            # parts can be restored after the bindings have been generated.
+            if self.incremental:
+                self._save_previous_build()
+
             # Now apply defaults for any options that depend on the Qt
             # configuration.
             if self.spec is None:
@@ -94,6 +172,40 @@ class QmakeBuilder(Builder):
 
             project.py_platform = py_platform
 
+            # Profile guided optimisation needs GCC or Clang.
+            if self.pgo:
+                if py_platform == 'win32':
+                    raise PyProjectOptionException('pgo',
+                            "is not supported on Windows")
+
+                # The modules are trained by running make.  Note that the
+                # default of the make option hasn't been applied yet.
+                if self.make is False:
+                    raise PyProjectOptionException('pgo',
+                            "cannot be used if make is not run")
+
+                self.pgo = os.path.abspath(self.pgo)
+
+            # The memory available for compiler jobs is read from
+            # /proc/meminfo.
+            if self.memory_aware and not sys.platform.startswith('linux'):
+                raise PyProjectOptionException('memory-aware',
+                        "is only supported on Linux")
+
+            # The modules are checked using the compiler's syntax-only mode.
+            if self.verify_interpreters:
+                if py_platform == 'win32':
+                    raise PyProjectOptionException('verify-interpreters',
+                            "is not supported on Windows")
+
+                # The compiler would use the precompiled header created with
+                # the Python.h being used for the build (GCC doesn't check the
+                # include path when validating a precompiled header) so the
+                # check would prove nothing.
+                if self.precompiled_header:
+                    raise PyProjectOptionException('verify-interpreters',
+                            "cannot be used with a precompiled header")
+
             # Set the default minimum GLIBC version.  This is actually a
             # function of the build platform and it should really be determined
             # by inspecting the compiled extension module.  These defaults
@@ -146,49 +258,126 @@ class QmakeBuilder(Builder):
 
         super().apply_user_defaults(tool)
 
+    def build(self):
+        """ Build the project in-situ. """
+
+        try:
+            super().build()
+        except BaseException:
+            self._write_trace(fatal=False)
+            raise
+
+        self._write_trace()
+
     def build_executable(self, buildable, *, fatal=True):
         """ Build an executable from a BuildableExecutable object and return
-        the relative pathname of the executable.
+        the relative pathname of the executable.  The current directory is not
+        changed so this may be called from any thread.
         """
 
-        # The name of the .pro file.
-        pro_path = os.path.join(buildable.build_dir, buildable.target + '.pro')
+        pro_path = self._write_executable_pro_file(buildable)
 
-        # Create the .pro file.
-        pro_lines = []
+        if self._run_qmake(pro_path, fatal=fatal, cwd=buildable.build_dir):
+            exe = self._run_make(buildable.target, buildable.debug,
+                    fatal=fatal, cwd=buildable.build_dir)
+        else:
+            exe = None
 
-        self._update_pro_file(pro_lines, buildable)
+        return exe
 
-        pf = self.project.open_for_writing(pro_path)
-        pf.write('\n'.join(pro_lines))
-        pf.close()
+    def build_executables(self, buildables, *, fatal=True):
+        """ Build a number of executables from BuildableExecutable objects
+        using a single qmake and make invocation and return a list of the
+        relative pathnames of the executables.  An element of the list will be
+        None if the corresponding executable couldn't be built.
+        """
 
-        saved_cwd = os.getcwd()
-        os.chdir(buildable.build_dir)
+        project = self.project
 
-        if self._run_qmake(pro_path, fatal=fatal):
-            exe = self._run_make(buildable.target, buildable.debug,
-                    fatal=fatal)
-        else:
-            exe = None
+        # Create a top-level .pro file that contains a .pro file for each
+        # executable.
+        batch_dir = os.path.join(project.build_dir, 'config-tests')
+        os.makedirs(batch_dir, exist_ok=True)
 
-        os.chdir(saved_cwd)
+        pro_lines = ['TEMPLATE = subdirs']
 
-        return exe
+        for buildable in buildables:
+            pro_path = self._write_executable_pro_file(buildable)
+
+            # Make sure the executable doesn't already exist.
+            _, platform_exe = self._get_platform_exe(buildable.target,
+                    buildable.debug)
+            self._remove_file(os.path.join(buildable.build_dir, platform_exe))
+
+            pro_lines.append('SUBDIRS += {}'.format(buildable.target))
+            pro_lines.append(
+                    '{}.file = {}'.format(buildable.target,
+                            self.qmake_quote(
+                                    os.path.relpath(pro_path, batch_dir))))
+
+        pro_name = os.path.join(batch_dir, 'config-tests.pro')
+        self._write_pro_file(pro_name, pro_lines)
+
+        # Build all the executables, carrying on after any errors.
+        exes = []
+
+        if self._run_qmake(pro_name, fatal=fatal, recursive=True,
+                cwd=batch_dir):
+            make = self._find_make()
+            args = [make]
+
+            if make == 'nmake':
+                args.append('/K')
+            elif make == 'jom':
+                args.append('/K')
+                args.append('/J')
+                args.append(str(self.jobs))
+            else:
+                args.append('-k')
+
+                if project.py_platform != 'win32':
+                    args.append('-j')
+                    args.append(str(self.jobs))
+
+            self._run_command(args, cwd=batch_dir, fatal=False)
+
+            for buildable in buildables:
+                _, platform_exe = self._get_platform_exe(buildable.target,
+                        buildable.debug)
+
+                if os.path.isfile(
+                        os.path.join(buildable.build_dir, platform_exe)):
+                    exes.append(platform_exe)
+                elif fatal:
+                    raise UserException(
+                            "Unable to build '{0}'".format(buildable.target))
+                else:
+                    exes.append(None)
+        else:
+            exes = [None] * len(buildables)
+
+        return exes
 
     def build_project(self, target_dir, *, wheel_tag=None):
         """ Build the project. """
 
         project = self.project
 
+        # Determine the dependencies between the buildables before any file
+        # names are made relative.
+        subdir_depends = self._get_subdir_dependencies()
+
         # Create the .pro file for each set of bindings.
         installed = []
         subdirs = []
 
         for buildable in project.buildables:
             if isinstance(buildable, BuildableModule):
-                self._generate_module_pro_file(buildable, target_dir,
-                        installed)
+                with self.build_trace.span(
+                        "Generating the {0} .pro file".format(buildable.name),
+                        'pro'):
+                    self._generate_module_pro_file(buildable, target_dir,
+                            installed)
             elif type(buildable) is Buildable:
                 for installable in buildable.installables:
                     installable.install(target_dir, installed,
@@ -200,15 +389,29 @@ class QmakeBuilder(Builder):
 
             subdirs.append(buildable.name)
 
+        # Start the modules that took longest to make in previous builds first
+        # so that they don't extend the overall time of a parallel build.
+        # Modules with no history are assumed to take a long time.
+        module_durations = self._get_module_durations()
+        subdirs.sort(key=lambda s: -module_durations.get(s, float('inf')))
+
         # Create the top-level .pro file.
         project.progress("Generating the top-level .pro file")
 
         pro_lines = []
 
         pro_lines.append('TEMPLATE = subdirs')
-        pro_lines.append('CONFIG += ordered nostrip')
+        pro_lines.append('CONFIG += nostrip')
         pro_lines.append('SUBDIRS = {}'.format(' '.join(subdirs)))
 
+        # Only serialise the sub-makes where there is a real dependency so that
+        # independent modules are compiled at the same time.
+        for subdir in subdirs:
+            depends = subdir_depends.get(subdir)
+            if depends:
+                pro_lines.append(
+                        '{}.depends = {}'.format(subdir, ' '.join(depends)))
+
         # Add any project-level installables.
         for installable in project.installables:
             self._install(pro_lines, installed, installable, target_dir)
@@ -241,23 +444,72 @@ class QmakeBuilder(Builder):
         pro_name = os.path.join(project.build_dir, project.name + '.pro')
         self._write_pro_file(pro_name, pro_lines)
 
+        makefiles_key_file = os.path.join(project.build_dir,
+                '.pyqtbuild-makefiles')
+        makefiles_key = self._get_makefiles_key()
+
+        # Restore any previous build now that the .pro files have been written
+        # so that the modules that are configured differently are known.
+        if self._previous_build_dir is not None:
+            self._restore_previous_build(target_dir, makefiles_key_file,
+                    makefiles_key)
+
         # Run qmake to generate the Makefiles.
         project.progress("Generating the Makefiles")
 
         saved_cwd = os.getcwd()
         os.chdir(project.build_dir)
 
-        self._run_qmake(pro_name, recursive=True)
+        if self.incremental and self._makefiles_are_current(pro_name,
+                makefiles_key_file, makefiles_key):
+            project.progress("The Makefiles are up to date")
+        else:
+            self._remove_file(makefiles_key_file)
+
+            with self.build_trace.span("Running qmake", 'qmake'):
+                self._run_qmake(pro_name, recursive=True)
+
+            # Record what the Makefiles were generated with.
+            self._write_file(makefiles_key_file, makefiles_key)
 
         # Run make, if requested, to generate the bindings.
         if self.make:
             project.progress("Compiling the project")
-            self._run_project_make()
+
+            launcher_stats = self._get_launcher_stats()
+            self._remove_compile_report()
+
+            if self.pgo:
+                self._run_project_make_with_pgo(target_dir)
+            else:
+                self._run_project_make()
+
+            self._report_launcher_stats(launcher_stats)
+            self._write_compile_report()
+            self._save_module_durations()
+
+            if self.verify_interpreters:
+                self._verify_interpreters()
 
         os.chdir(saved_cwd)
 
         return None
 
+    def build_wheel(self, wheel_directory):
+        """ Build a wheel for the project and return the name of the wheel
+        file.
+        """
+
+        try:
+            wheel_file = super().build_wheel(wheel_directory)
+        except BaseException:
+            self._write_trace(fatal=False)
+            raise
+
+        self._write_trace()
+
+        return wheel_file
+
     def get_options(self):
         """ Return the sequence of configurable options. """
 
@@ -265,14 +517,104 @@ class QmakeBuilder(Builder):
         options = super().get_options()
 
         # Add our new options.
+        options.append(
+                Option('cache', option_type=bool, inverted=True,
+                        help="do not use the cache of build information"))
+
+        options.append(
+                Option('cache_dir',
+                        help="the cache of build information is in DIR",
+                        metavar="DIR"))
+
+        options.append(
+                Option('cache_size', option_type=int, default=100,
+                        help="limit the size of the cache of build "
+                                "information to N megabytes",
+                        metavar="N"))
+
+        options.append(
+                Option('clear_cache', option_type=bool,
+                        help="clear the cache of build information"))
+
+        options.append(
+                Option('compile_report',
+                        help="display the time and memory used to compile "
+                                "each module and source file and write them "
+                                "to the JSON file FILE",
+                        metavar="FILE"))
+
+        options.append(
+                Option('compiler_launcher',
+                        help="run the compiler using LAUNCHER (eg. ccache or "
+                                "sccache) or 'auto' to use any that is found",
+                        metavar="LAUNCHER"))
+
+        options.append(
+                Option('fast_load', option_type=bool,
+                        help="link the modules so that they load quickly "
+                                "(Linux only)"))
+
+        options.append(
+                Option('incremental', option_type=bool,
+                        help="only regenerate the Makefiles and recompile the "
+                                "modules that have changed since the "
+                                "previous build"))
+
+        options.append(
+                Option('install_method',
+                        choices=['copy', 'hardlink', 'make', 'reflink'],
+                        default='make',
+                        help="install the files by running make (the "
+                                "default), copying them, hard-linking them or "
+                                "by creating copy-on-write clones of them",
+                        metavar="METHOD"))
+
         options.append(
                 Option('jobs', option_type=int,
-                        help="run N make jobs in parallel", metavar='N'))
+                        help="run N make jobs in parallel (the default is the "
+                                "number of usable CPUs)",
+                        metavar='N'))
+
+        options.append(
+                Option('jom', option_type=bool,
+                        help="use jom rather than nmake"))
+
+        options.append(
+                Option('link_binding', choices=['lazy', 'now'],
+                        help="resolve the symbols of the modules when they "
+                                "are first used or when they are loaded "
+                                "(Linux only)",
+                        metavar="BINDING"))
+
+        options.append(
+                Option('linker',
+                        help="link the modules using LINKER (eg. lld or mold) "
+                                "(Linux only)",
+                        metavar="LINKER"))
+
+        options.append(
+                Option('lto', option_type=bool,
+                        help="use link-time optimisation"))
 
         options.append(
                 Option('make', option_type=bool, inverted=True,
                         help="do not run make or nmake", tools=['build']))
 
+        options.append(
+                Option('memory_aware', option_type=bool,
+                        help="only start a compiler job when there is enough "
+                                "memory available for it"))
+
+        options.append(
+                Option('pgo',
+                        help="use profile guided optimisation with a profile "
+                                "created by running the Python script SCRIPT",
+                        metavar="SCRIPT"))
+
+        options.append(
+                Option('precompiled_header', option_type=bool,
+                        help="use a precompiled header for each module"))
+
         options.append(
                 Option('qmake', help="the pathname of qmake is FILE",
                         metavar="FILE"))
@@ -286,8 +628,37 @@ class QmakeBuilder(Builder):
                 Option('spec', help="pass -spec SPEC to qmake",
                         metavar="SPEC"))
 
+        options.append(
+                Option('trace',
+                        help="write a Chrome trace of the phases of the build "
+                                "to FILE",
+                        metavar="FILE"))
+
+        options.append(
+                Option('unity_build', option_type=bool,
+                        help="compile the generated sources of each module as "
+                                "a small number of larger source files"))
+
+        options.append(
+                Option('verify_interpreters', option_type=list,
+                        help="check that the modules that use the limited "
+                                "API can be compiled against the Python.h of "
+                                "the Python interpreter PYTHON",
+                        metavar="PYTHON"))
+
         return options
 
+    def install(self):
+        """ Install the project. """
+
+        try:
+            super().install()
+        except BaseException:
+            self._write_trace(fatal=False)
+            raise
+
+        self._write_trace()
+
     def install_project(self, target_dir, *, wheel_tag=None):
         """ Install the project into a target directory. """
 
@@ -295,10 +666,28 @@ class QmakeBuilder(Builder):
 
         project.progress("Installing the project")
 
-        saved_cwd = os.getcwd()
-        os.chdir(project.build_dir)
-        self._run_project_make(install=True)
-        os.chdir(saved_cwd)
+        if self.install_method == 'make':
+            saved_cwd = os.getcwd()
+            os.chdir(project.build_dir)
+
+            with self.build_trace.span("Installing the project", 'install'):
+                self._run_project_make(install=True)
+
+            os.chdir(saved_cwd)
+
+            return
+
+        # Install the files directly rather than have make re-enter every
+        # sub-directory and copy one file at a time.  The RECORD entry of each
+        # file is computed as it is installed.
+        with self.build_trace.span("Installing the project", 'install'):
+            records = self._install_files(
+                    self._get_installed_files(target_dir))
+
+        if project.distinfo:
+            with self.build_trace.span("Creating the .dist-info directory",
+                    'distinfo'):
+                self._write_distinfo(target_dir, wheel_tag, records)
 
     @staticmethod
     def qmake_quote(path):
@@ -312,6 +701,163 @@ class QmakeBuilder(Builder):
 
         return path
 
+    @staticmethod
+    def _add_installed_files(installed_files, installable, sources,
+            base_dir, target_dir):
+        """ Add the source and target path names of each file installed by an
+        installable to a list.  Relative source names are relative to a base
+        directory and a directory is installed recursively.
+        """
+
+        full_target_dir = installable.get_full_target_dir(target_dir)
+
+        for source in sources:
+            source = os.path.join(base_dir, source)
+            target = os.path.join(full_target_dir, os.path.basename(source))
+
+            if os.path.isdir(source):
+                for dirpath, _, filenames in os.walk(source):
+                    for filename in filenames:
+                        file_source = os.path.join(dirpath, filename)
+                        installed_files.append((file_source,
+                                os.path.join(target,
+                                        os.path.relpath(file_source,
+                                                source))))
+            else:
+                installed_files.append((source, target))
+
+    @classmethod
+    def _compare_file(cls, source, target):
+        """ Compare the contents of a source file with those of a target file
+        of the same size and return a 3-tuple of True if they are the same,
+        the encoded SHA256 digest of the source and its size.  The comparison
+        stops at the first difference, in which case the digest and size are
+        None.
+        """
+
+        digest = hashlib.sha256()
+        size = 0
+
+        with open(source, 'rb') as src, open(target, 'rb') as tgt:
+            while True:
+                chunk = src.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if tgt.read(len(chunk)) != chunk:
+                    return False, None, None
+
+                digest.update(chunk)
+                size += len(chunk)
+
+        return True, cls._encode_digest(digest), size
+
+    @classmethod
+    def _copy_file(cls, source, target):
+        """ Copy a file, including its permissions and timestamps, and return
+        a 2-tuple of the encoded SHA256 digest of its contents and its size.
+        """
+
+        digest = hashlib.sha256()
+        size = 0
+
+        with open(source, 'rb') as src, open(target, 'wb') as tgt:
+            while True:
+                chunk = src.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                digest.update(chunk)
+                size += len(chunk)
+                tgt.write(chunk)
+
+        shutil.copystat(source, target)
+
+        return cls._encode_digest(digest), size
+
+    def _create_precompiled_header(self, buildable):
+        """ Create a header file for an extension module that is suitable to
+        be precompiled and return its name relative to the build directory.
+        None is returned if a precompiled header cannot be used.
+        """
+
+        build_dir = os.path.abspath(buildable.build_dir)
+
+        # The header is C++ so it can't be used if there are any C sources.
+        for source in buildable.sources:
+            if not source.endswith(('.cpp', '.cc', '.cxx')):
+                return None
+
+        # The module's API header includes Python.h so must come first.
+        api_header = 'sipAPI{}.h'.format(buildable.target)
+        if not os.path.isfile(os.path.join(build_dir, api_header)):
+            return None
+
+        includes = ['"{}"'.format(api_header)]
+
+        # Add the system (ie. Qt) headers that are unconditionally included by
+        # the generated sources.
+        include_re = re.compile(r'\s*#\s*include\s*(<[^>]+>)')
+        if_re = re.compile(r'\s*#\s*if')
+        endif_re = re.compile(r'\s*#\s*endif')
+
+        for source in buildable.sources:
+            source_path = os.path.abspath(source)
+
+            if os.path.dirname(source_path) != build_dir:
+                continue
+
+            try:
+                with open(source_path) as f:
+                    depth = 0
+
+                    for line in f:
+                        if if_re.match(line):
+                            depth += 1
+                        elif endif_re.match(line):
+                            depth -= 1
+                        elif depth == 0:
+                            m = include_re.match(line)
+                            if m is not None and m.group(1) not in includes:
+                                includes.append(m.group(1))
+            except (OSError, UnicodeDecodeError):
+                return None
+
+        header = 'sip{}pch.h'.format(buildable.target)
+
+        self._write_file(os.path.join(build_dir, header),
+                ''.join(['#include {}\n'.format(i) for i in includes]))
+
+        return header
+
+    @staticmethod
+    def _encode_digest(digest):
+        """ Return a SHA256 digest encoded as required by a RECORD file. """
+
+        return base64.urlsafe_b64encode(digest.digest()).rstrip(
+                b'=').decode('ascii')
+
+    @classmethod
+    def _expand(cls, value, variables, expanding=()):
+        """ Return a value with any references to Makefile variables expanded.
+        """
+
+        def expand_ref(m):
+            name = m.group(1)
+
+            # Guard against (invalid) recursive definitions.
+            if name in expanding:
+                return ''
+
+            return cls._expand(variables.get(name, ''), variables,
+                    expanding + (name, ))
+
+        # Protect any escaped '$' while variable references are expanded.
+        value = value.replace('$$', '\0')
+        value = re.sub(r'\$\(([A-Za-z0-9_]+)\)', expand_ref, value)
+
+        return value.replace('\0', '$')
+
     @classmethod
     def _find_exe(cls, exe):
         """ Find an executable, ie. the first on the path. """
@@ -333,6 +879,8 @@ class QmakeBuilder(Builder):
         if self.project.py_platform == 'win32':
             if 'g++' in self.spec:
                 make = 'make'
+            elif self.jom:
+                make = 'jom'
             else:
                 make = 'nmake'
         else:
@@ -374,6 +922,16 @@ class QmakeBuilder(Builder):
         if project.qml_debug:
             pro_lines.append('CONFIG += qml_debug')
 
+        if self.lto:
+            pro_lines.append('CONFIG += ltcg')
+
+        # The flags that depend on the phase of a profile guided optimisation
+        # are passed to make.
+        if self.pgo:
+            pro_lines.append('QMAKE_CFLAGS += $(PYQTBUILD_PGO_FLAGS)')
+            pro_lines.append('QMAKE_CXXFLAGS += $(PYQTBUILD_PGO_FLAGS)')
+            pro_lines.append('QMAKE_LFLAGS += $(PYQTBUILD_PGO_FLAGS)')
+
         # Work around QTBUG-39300.
         pro_lines.append('CONFIG -= android_install')
 
@@ -382,8 +940,27 @@ class QmakeBuilder(Builder):
                     'ANDROID_ABIS = "{}"'.format(
                             ' '.join(project.android_abis)))
 
+        if self.precompiled_header:
+            precompiled_header = self._create_precompiled_header(buildable)
+        else:
+            precompiled_header = None
+
         self._update_pro_file(pro_lines, buildable)
 
+        if precompiled_header:
+            pro_lines.append('CONFIG += precompile_header')
+            pro_lines.append(
+                    'PRECOMPILED_HEADER = {}'.format(precompiled_header))
+
+        # Wrap the compiler if required.  Note that the linker is set from the
+        # compiler by the spec so it isn't affected.
+        compiler_wrapper = self._get_compiler_wrapper()
+        if compiler_wrapper:
+            pro_lines.append(
+                    'QMAKE_CC = {} $$QMAKE_CC'.format(compiler_wrapper))
+            pro_lines.append(
+                    'QMAKE_CXX = {} $$QMAKE_CXX'.format(compiler_wrapper))
+
         # Qt (when built with MinGW) assumes that stack frames are 16 byte
         # aligned because it uses SSE.  However the Python Windows installers
         # are built with 4 byte aligned stack frames.  We therefore need to
@@ -443,16 +1020,30 @@ macx {
 
         # This optimisation could apply to other platforms.
         if 'linux' in self.spec and not buildable.static:
-            exp = project.open_for_writing(
+            self._write_file(
                     os.path.join(buildable.build_dir,
-                            buildable.target + '.exp'))
-            exp.write('{ global: PyInit_%s; local: *; };' % buildable.target)
-            exp.close()
+                            buildable.target + '.exp'),
+                    '{ global: PyInit_%s; local: *; };' % buildable.target)
 
             pro_lines.append(
                     'QMAKE_LFLAGS += -Wl,--version-script={}.exp'.format(
                             buildable.target))
 
+            # Reduce the number of relocations and dynamic symbol lookups
+            # needed when the module is imported.
+            if self.fast_load:
+                pro_lines.append(
+                        'QMAKE_LFLAGS += -Wl,-O1 -Wl,-Bsymbolic '
+                        '-Wl,--as-needed -Wl,--hash-style=gnu')
+
+            if self.link_binding:
+                pro_lines.append(
+                        'QMAKE_LFLAGS += -Wl,-z,{}'.format(self.link_binding))
+
+            if self.linker:
+                pro_lines.append(
+                        'QMAKE_LFLAGS += -fuse-ld={}'.format(self.linker))
+
         pro_lines.append(
                 'INCLUDEPATH += {}'.format(
                         self.qmake_quote(project.py_include_dir)))
@@ -475,120 +1066,221 @@ macx {
                 os.path.join(buildable.build_dir, buildable.name + '.pro'),
                 pro_lines)
 
-    def _get_qt_configuration(self):
-        """ Run qmake to get the details of the Qt configuration. """
-
-        project = self.project
+    def _get_compiler_wrapper(self):
+        """ Return the command line that wraps each invocation of the compiler
+        or None if the compiler isn't wrapped.
+        """
 
-        project.progress("Querying qmake about your Qt installation")
+        if not self.memory_aware and not self.compile_report:
+            return None
 
-        self.qt_configuration = {}
+        project = self.project
 
-        for line in project.read_command_pipe([self.qmake, '-query']):
-            line = line.strip()
+        wrapper = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                'compile_wrapper.py')
 
-            tokens = line.split(':', maxsplit=1)
-            if isinstance(tokens, list):
-                if len(tokens) != 2:
-                    raise UserException(
-                            "Unexpected output from qmake: '{0}'".format(line))
+        args = [self._quote(sys.executable), self._quote(wrapper)]
 
-                name, value = tokens
+        if self.memory_aware:
+            # The peak memory used by each translation unit is kept with the
+            # other build information so that it is available to later builds.
+            if self.build_cache is not None:
+                state_dir = self.build_cache.get_state_dir('compile-memory')
             else:
-                name = tokens
-                value = None
-
-            name = name.replace('/', '_')
+                state_dir = os.path.join(project.build_dir, 'compile-memory')
 
-            self.qt_configuration[name] = value
+            args.append('--memory-state')
+            args.append(self._quote(state_dir))
 
-        # Get the Qt version.
-        self.qt_version = 0
-        try:
-            self.qt_version_str = self.qt_configuration['QT_VERSION']
-            for v in self.qt_version_str.split('.'):
-                self.qt_version <<= 8
-                self.qt_version += int(v)
-        except AttributeError:
-            self.qt_version_str = "3"
+            # The state is shared by all projects.
+            args.append('--project')
+            args.append(self._quote(os.path.abspath(project.root_dir)))
 
-        # Requiring Qt v5.6 allows us to drop some old workarounds.
-        if self.qt_version < 0x050600:
-            raise UserException(
-                    "Qt v5.6 or later is required and you seem to be using "
-                            "v{0}".format(self.qt_version_str))
+        if self.compile_report:
+            args.append('--report')
+            args.append(self._quote(self._get_compile_report_dir()))
 
-        # Convert the version number to what would be used in a tag.
-        major = (self.qt_version >> 16) & 0xff
-        minor = (self.qt_version >> 8) & 0xff
-        patch = self.qt_version & 0xff
+        return ' '.join(args)
 
-        # Qt v5.12.4 was the last release where we updated for a patch version.
-        # This should be safe to do (given Qt's supposed use of semantic
-        # versioning) and removes the need to add new patch versions for old
-        # (ie. LTS) versions.  However Qt v5.15 breaks semantic versioning so
-        # we need the patch version, but as it is the very last minor version
-        # of Qt5 we don't need to worry about old versions.
-        if (5, 13) <= (major, minor) < (5, 15) or major >= 6:
-            patch = 0
-        elif (5, 12, 4) <= (major, minor, patch) < (5, 13, 0):
-            patch = 4
+    def _get_compile_report_dir(self):
+        """ Return the name of the directory containing the resources used to
+        compile each source file.
+        """
 
-        self.qt_version_tag = '{}_{}_{}'.format(major, minor, patch)
+        return os.path.join(os.path.abspath(self.project.build_dir),
+                'compile-report')
 
-    def _install(self, pro_lines, installed, installable, target_dir):
-        """ Add the lines to install files to a .pro file and a list of all
-        installed files.
+    def _get_installed_files(self, target_dir):
+        """ Return a list of 2-tuples of the source and target path names of
+        each file installed by the project.
         """
 
-        installable.install(target_dir, installed, do_install=False)
+        project = self.project
 
-        pro_lines.append(
-                '{}.path = {}'.format(installable.name,
-                        installable.get_full_target_dir(target_dir).replace(
-                                '\\', '/')))
+        installed_files = []
 
-        if not isinstance(installable, QmakeTargetInstallable):
-            files = [fn.replace('\\', '/') for fn in installable.files]
-            pro_lines.append(
-                    '{}.files = {}'.format(installable.name, ' '.join(files)))
+        for buildable in project.buildables:
+            for installable in buildable.installables:
+                sources = installable.files
+
+                # qmake installs the library of a static module rather than
+                # the module itself.
+                if (isinstance(installable, QmakeTargetInstallable) and
+                        buildable.static):
+                    if (project.py_platform == 'win32' and
+                            self.spec != 'win32-g++'):
+                        sources = [buildable.target + '.lib']
+                    else:
+                        sources = ['lib' + buildable.target + '.a']
 
-        pro_lines.append('INSTALLS += {}'.format(installable.name))
+                self._add_installed_files(installed_files, installable,
+                        sources, buildable.build_dir, target_dir)
 
-    @staticmethod
-    def _is_exe(exe_path):
-        """ Return True if an executable exists. """
+        for installable in project.installables:
+            self._add_installed_files(installed_files, installable,
+                    installable.files, project.build_dir, target_dir)
 
-        return os.access(exe_path, os.X_OK)
+        return installed_files
 
     @staticmethod
-    def _quote(path):
-        """ Return a path with quotes added if it contains spaces. """
+    def _get_interpreter_include_dir(interpreter, buildables):
+        """ Return the name of the directory containing the Python.h of a
+        Python interpreter after checking that it supports the limited API
+        used by a sequence of modules.
+        """
 
-        if ' ' in path:
-            path = '"{}"'.format(path)
+        script = ('import sys, sysconfig; '
+                'print(sysconfig.get_path("include")); '
+                'print(sys.version_info[0], sys.version_info[1])')
 
-        return path
+        try:
+            result = subprocess.run([interpreter, '-c', script],
+                    stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                    universal_newlines=True, check=True)
+            include_dir, version = result.stdout.splitlines()[:2]
+            version = tuple(int(v) for v in version.split())
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            raise UserException(
+                    "Unable to get the configuration of the Python "
+                    "interpreter '{0}'".format(interpreter),
+                    detail=str(e))
+
+        # Get the oldest version of Python supported by the modules from the
+        # version of the limited API they use.  Note that
+        # Project.limited_abi_version isn't available in all supported
+        # versions of sip.
+        major = minor = 0
+
+        for buildable in buildables:
+            for macro in buildable.define_macros:
+                name, _, value = macro.partition('=')
+                if name != 'Py_LIMITED_API':
+                    continue
+
+                try:
+                    hex_version = int(value, 16)
+                except ValueError:
+                    continue
+
+                major, minor = max((major, minor),
+                        (hex_version >> 24, (hex_version >> 16) & 0xff))
+
+        if version < (major, minor):
+            raise UserException(
+                    "The Python interpreter '{0}' is v{1}.{2} but the modules "
+                    "require at least v{3}.{4}".format(interpreter,
+                            version[0], version[1], major, minor))
 
-    @staticmethod
-    def _remove_file(fname):
-        """ Remove a file which may or may not exist. """
+        return include_dir
 
-        try:
-            os.remove(fname)
-        except OSError:
-            pass
+    def _get_launcher_stats(self):
+        """ Return a 2-tuple of the number of cache hits and misses reported by
+        the compiler launcher or None if they are not known.
+        """
 
-    def _run_make(self, exe, debug, fatal=True):
-        """ Run make against a Makefile to create an executable.  Returns the
-        platform specific name of the executable, or None if an executable
-        wasn't created.
+        launcher = self.compiler_launcher
+        if not launcher:
+            return None
+
+        name = os.path.splitext(os.path.basename(launcher))[0]
+
+        if name == 'ccache':
+            args = [launcher, '--print-stats']
+        elif name == 'sccache':
+            args = [launcher, '--show-stats', '--stats-format=json']
+        else:
+            return None
+
+        try:
+            output = subprocess.run(args, capture_output=True, text=True,
+                    check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        hits = misses = 0
+
+        try:
+            if name == 'ccache':
+                for line in output.splitlines():
+                    parts = line.split('\t')
+                    if len(parts) != 2:
+                        continue
+
+                    key, value = parts
+
+                    # Note that the names of the statistics changed in v4.
+                    if key in ('direct_cache_hit', 'preprocessed_cache_hit',
+                            'cache_hit_direct', 'cache_hit_preprocessed'):
+                        hits += int(value)
+                    elif key == 'cache_miss':
+                        misses += int(value)
+            else:
+                stats = json.loads(output)['stats']
+
+                hits = sum(stats['cache_hits']['counts'].values())
+                misses = sum(stats['cache_misses']['counts'].values())
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        return hits, misses
+
+    def _get_makefiles_key(self):
+        """ Return the key that identifies the qmake, spec and settings that
+        the Makefiles are generated with.
+        """
+
+        return BuildCache.key(self.qmake, self.spec, self.qmake_settings,
+                self._get_qt_configuration_key())
+
+    def _get_module_durations(self):
+        """ Return a dict of the number of seconds it took to make each module
+        in the previous build of the project.
+        """
+
+        if self.build_cache is None:
+            return {}
+
+        module_durations = self.build_cache.get('module-durations',
+                self._get_module_durations_key())
+
+        return module_durations if isinstance(module_durations, dict) else {}
+
+    def _get_module_durations_key(self):
+        """ Return the key used to cache the time it took to make each module.
+        """
+
+        project = self.project
+
+        return BuildCache.key(project.root_dir, project.name)
+
+    def _get_platform_exe(self, exe, debug):
+        """ Return a 2-tuple of the Makefile target that will create an
+        executable and the platform specific name of the executable.
         """
 
         project = self.project
 
-        # Guess the name of make and set the default target and platform
-        # specific name of the executable.
+        # Set the default target and platform specific name of the executable.
         if project.py_platform == 'win32':
             if debug:
                 makefile_target = 'debug'
@@ -605,43 +1297,956 @@ macx {
             else:
                 platform_exe = os.path.join('.', exe)
 
+        return makefile_target, platform_exe
+
+    def _get_qt_configuration(self):
+        """ Run qmake to get the details of the Qt configuration. """
+
+        project = self.project
+
+        # See if the configuration has been cached.
+        if self.build_cache is not None:
+            cache_key = self._get_qt_configuration_key()
+            self.qt_configuration = self.build_cache.get('qt-configuration',
+                    cache_key)
+        else:
+            self.qt_configuration = None
+
+        if self.qt_configuration is None:
+            project.progress("Querying qmake about your Qt installation")
+
+            self.qt_configuration = {}
+
+            with self.build_trace.span("Querying qmake", 'qt'):
+                for line in project.read_command_pipe([self.qmake, '-query']):
+                    line = line.strip()
+
+                    tokens = line.split(':', maxsplit=1)
+                    if isinstance(tokens, list):
+                        if len(tokens) != 2:
+                            raise UserException(
+                                    "Unexpected output from qmake: "
+                                            "'{0}'".format(line))
+
+                        name, value = tokens
+                    else:
+                        name = tokens
+                        value = None
+
+                    name = name.replace('/', '_')
+
+                    self.qt_configuration[name] = value
+
+            if self.build_cache is not None:
+                self.build_cache.set('qt-configuration', cache_key,
+                        self.qt_configuration)
+        else:
+            project.progress(
+                    "Using the cached details of your Qt installation")
+
+        # Get the Qt version.
+        self.qt_version = 0
+        try:
+            self.qt_version_str = self.qt_configuration['QT_VERSION']
+            for v in self.qt_version_str.split('.'):
+                self.qt_version <<= 8
+                self.qt_version += int(v)
+        except AttributeError:
+            self.qt_version_str = "3"
+
+        # Requiring Qt v5.6 allows us to drop some old workarounds.
+        if self.qt_version < 0x050600:
+            raise UserException(
+                    "Qt v5.6 or later is required and you seem to be using "
+                            "v{0}".format(self.qt_version_str))
+
+        # Convert the version number to what would be used in a tag.
+        major = (self.qt_version >> 16) & 0xff
+        minor = (self.qt_version >> 8) & 0xff
+        patch = self.qt_version & 0xff
+
+        # Qt v5.12.4 was the last release where we updated for a patch version.
+        # This should be safe to do (given Qt's supposed use of semantic
+        # versioning) and removes the need to add new patch versions for old
+        # (ie. LTS) versions.  However Qt v5.15 breaks semantic versioning so
+        # we need the patch version, but as it is the very last minor version
+        # of Qt5 we don't need to worry about old versions.
+        if (5, 13) <= (major, minor) < (5, 15) or major >= 6:
+            patch = 0
+        elif (5, 12, 4) <= (major, minor, patch) < (5, 13, 0):
+            patch = 4
+
+        self.qt_version_tag = '{}_{}_{}'.format(major, minor, patch)
+
+    def _get_qt_configuration_key(self):
+        """ Return the key used to cache the Qt configuration.  This changes if
+        qmake, its qt.conf file or the relevant environment changes.
+        """
+
+        qmake = self.qmake.strip('"')
+        qt_conf = os.path.join(os.path.dirname(qmake), 'qt.conf')
+
+        files = []
+
+        for fn in (qmake, qt_conf):
+            try:
+                st = os.stat(fn)
+                files.append((fn, st.st_size, st.st_mtime_ns))
+            except OSError:
+                files.append((fn, None, None))
+
+        environment = [(name, os.environ.get(name))
+                for name in ('QMAKEPATH', 'QMAKESPEC', 'QT_SELECT', 'QTDIR')]
+
+        return BuildCache.key(files, environment)
+
+    def _get_subdir_dependencies(self):
+        """ Return a dict, keyed by buildable name, of the list of names of the
+        other buildables that a buildable depends on.  A buildable depends on
+        another if it links against its target or refers to a file or
+        directory in its build directory.
+        """
+
+        project = self.project
+
+        def abs_path(name):
+            return os.path.normpath(os.path.join(project.root_dir, name))
+
+        modules = [b for b in project.buildables
+                if isinstance(b, BuildableModule)]
+
+        subdir_depends = {}
+
+        for buildable in modules:
+            names = []
+
+            for name_list in (buildable.include_dirs, buildable.headers,
+                    buildable.sources, buildable.library_dirs,
+                    buildable.extra_objects):
+                names.extend([abs_path(n) for n in name_list])
+
+            depends = []
+
+            for other in modules:
+                if other is buildable:
+                    continue
+
+                other_dir = os.path.normpath(other.build_dir)
+
+                if other.target in buildable.libraries:
+                    depends.append(other.name)
+                    continue
+
+                for name in names:
+                    if name == other_dir or name.startswith(
+                            other_dir + os.sep):
+                        depends.append(other.name)
+                        break
+
+            subdir_depends[buildable.name] = depends
+
+        return subdir_depends
+
+    def _get_syntax_check_commands(self, buildable, include_dir):
+        """ Return a list of the command lines that check the syntax of each
+        source file of a module against a directory containing Python.h.
+        The command lines are taken from the module's Makefile and are run in
+        the module's build directory.
+        """
+
+        variables, _ = self._parse_makefile(
+                os.path.join(buildable.build_dir, 'Makefile'))
+
+        def expand(name):
+            return self._expand(variables.get(name, ''), variables)
+
+        # Python.h will be found in the first directory that is searched.
+        incpath = '-I{0} {1}'.format(self._quote(include_dir),
+                expand('INCPATH'))
+
+        commands = []
+
+        for source in buildable.sources:
+            if source.endswith('.c'):
+                compiler, flags = expand('CC'), expand('CFLAGS')
+            else:
+                compiler, flags = expand('CXX'), expand('CXXFLAGS')
+
+            commands.append([compiler, '-fsyntax-only', flags, incpath,
+                    self._quote(source)])
+
+        return commands
+
+    @staticmethod
+    def _get_usable_cpu_count():
+        """ Return the number of CPUs that the build can use.  This takes into
+        account the CPU affinity of the process and any CPU quota imposed by a
+        Linux cgroup (as used by containers).
+        """
+
+        try:
+            nr_cpus = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            nr_cpus = os.cpu_count() or 1
+
+        # Find the smallest cgroup v2 quota of the process's own cgroup and its
+        # ancestors, including the root (which is what a container usually
+        # sees).  A quota may be imposed by any of them.
+        cgroup_root = '/sys/fs/cgroup'
+        cgroup_dirs = []
+
+        try:
+            with open('/proc/self/cgroup') as f:
+                for line in f:
+                    if line.startswith('0::'):
+                        cgroup = line[3:].strip().strip('/')
+
+                        while cgroup:
+                            cgroup_dirs.append(
+                                    os.path.join(cgroup_root, cgroup))
+                            cgroup = os.path.dirname(cgroup)
+        except OSError:
+            pass
+
+        cgroup_dirs.append(cgroup_root)
+
+        limits = []
+        cgroup_v2 = False
+
+        for cgroup_dir in cgroup_dirs:
+            try:
+                with open(os.path.join(cgroup_dir, 'cpu.max')) as f:
+                    quota, period = f.read().split()[:2]
+            except (OSError, ValueError):
+                continue
+
+            cgroup_v2 = True
+
+            # 'max' means there is no limit at this level.
+            if quota != 'max':
+                try:
+                    limits.append((int(quota), int(period)))
+                except ValueError:
+                    pass
+
+        if not cgroup_v2:
+            # Fall back to a cgroup v1 quota.
+            try:
+                with open(os.path.join(cgroup_root, 'cpu',
+                        'cpu.cfs_quota_us')) as f:
+                    quota = int(f.read())
+
+                with open(os.path.join(cgroup_root, 'cpu',
+                        'cpu.cfs_period_us')) as f:
+                    period = int(f.read())
+
+                limits.append((quota, period))
+            except (OSError, ValueError):
+                pass
+
+        # A negative v1 quota means there is no limit.
+        for quota, period in limits:
+            if quota > 0 and period > 0:
+                nr_cpus = min(nr_cpus, max(1, -(-quota // period)))
+
+        return nr_cpus
+
+    @classmethod
+    def _hash_file(cls, fname):
+        """ Return a 2-tuple of the encoded SHA256 digest of the contents of a
+        file and its size.
+        """
+
+        digest = hashlib.sha256()
+        size = 0
+
+        with open(fname, 'rb') as f:
+            while True:
+                chunk = f.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                digest.update(chunk)
+                size += len(chunk)
+
+        return cls._encode_digest(digest), size
+
+    def _install(self, pro_lines, installed, installable, target_dir):
+        """ Add the lines to install files to a .pro file and a list of all
+        installed files.
+        """
+
+        installable.install(target_dir, installed, do_install=False)
+
+        pro_lines.append(
+                '{}.path = {}'.format(installable.name,
+                        installable.get_full_target_dir(target_dir).replace(
+                                '\\', '/')))
+
+        if not isinstance(installable, QmakeTargetInstallable):
+            files = [fn.replace('\\', '/') for fn in installable.files]
+            pro_lines.append(
+                    '{}.files = {}'.format(installable.name, ' '.join(files)))
+
+        pro_lines.append('INSTALLS += {}'.format(installable.name))
+
+    def _install_file(self, source, target):
+        """ Install a file and return a 3-tuple of True if it was installed
+        (or False if the target already had the same contents), the encoded
+        SHA256 digest of its contents and its size.  The source file is only
+        read in full once as any comparison with an existing target stops at
+        the first difference.
+        """
+
+        try:
+            if os.path.samefile(source, target):
+                return (False, ) + self._hash_file(source)
+
+            if os.path.getsize(source) == os.path.getsize(target):
+                identical, digest, size = self._compare_file(source, target)
+                if identical:
+                    return False, digest, size
+
+            # Remove the target rather than overwrite it so that a module
+            # that is being used isn't changed underneath it and so that a
+            # link can be created.
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        linked = False
+
+        if self.install_method == 'hardlink':
+            try:
+                os.link(source, target)
+                linked = True
+            except OSError:
+                # The source and target are probably on different
+                # filesystems.
+                pass
+        elif self.install_method == 'reflink':
+            linked = self._reflink(source, target)
+
+        if linked:
+            record = self._hash_file(source)
+        else:
+            record = self._copy_file(source, target)
+
+        return (True, ) + record
+
+    def _install_files(self, installed_files):
+        """ Install a list of 2-tuples of source and target path names in
+        parallel and return a dict of the 2-tuple of the encoded SHA256 digest
+        and size of each installed file keyed by its target path name.
+        """
+
+        project = self.project
+
+        records = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs or None) as executor:
+            futures = [executor.submit(self._install_file, source, target)
+                    for source, target in installed_files]
+
+            nr_unchanged = 0
+
+            for (source, target), future in zip(installed_files, futures):
+                try:
+                    installed, digest, size = future.result()
+                except OSError as e:
+                    raise UserException(
+                            "Unable to install '{0}' as '{1}'".format(source,
+                                    target),
+                            detail=str(e))
+
+                if not installed:
+                    nr_unchanged += 1
+
+                records[target] = (digest, size)
+
+        if nr_unchanged:
+            project.progress(
+                    "{0} of {1} installed files were already up to "
+                    "date".format(nr_unchanged, len(installed_files)))
+
+        return records
+
+    @staticmethod
+    def _is_exe(exe_path):
+        """ Return True if an executable exists. """
+
+        return os.access(exe_path, os.X_OK)
+
+    @staticmethod
+    def _makefile_is_current(makefile, pro_name):
+        """ Return True if a Makefile was generated from a .pro file and is
+        newer than it.
+        """
+
+        try:
+            if os.path.getmtime(makefile) < os.path.getmtime(pro_name):
+                return False
+
+            # Check the Makefile was generated from the .pro file and not, for
+            # example, from the .pro file of a configuration test.
+            project_line = '# Project:  {}'.format(os.path.basename(pro_name))
+
+            with open(makefile) as f:
+                for _ in range(10):
+                    if f.readline().rstrip() == project_line:
+                        return True
+        except (OSError, ValueError):
+            pass
+
+        return False
+
+    def _makefiles_are_current(self, pro_name, key_file, key):
+        """ Return True if the Makefiles of the project are all current with
+        respect to the corresponding .pro files and were generated by the same
+        qmake with the same spec and settings.
+        """
+
+        project = self.project
+
+        if self._read_file(key_file) != key:
+            return False
+
+        if not self._makefile_is_current(
+                os.path.join(project.build_dir, 'Makefile'), pro_name):
+            return False
+
+        for buildable in project.buildables:
+            if isinstance(buildable, BuildableModule):
+                if not self._makefile_is_current(
+                        os.path.join(buildable.build_dir, 'Makefile'),
+                        os.path.join(buildable.build_dir,
+                                buildable.name + '.pro')):
+                    return False
+
+        return True
+
+    @classmethod
+    def _parse_makefile(cls, makefile):
+        """ Parse a qmake generated Makefile and return a 2-tuple of a dict of
+        the variables and a dict of the rules.  Each rule is a 2-tuple of the
+        list of dependencies and the list of commands with any variable
+        references expanded.
+        """
+
+        try:
+            with open(makefile) as f:
+                text = f.read()
+        except OSError as e:
+            raise UserException(
+                    "Unable to read '{0}'".format(makefile), detail=str(e))
+
+        # Join any continuation lines.
+        lines = re.sub(r'\\\n[ \t]*', ' ', text).split('\n')
+
+        variables = {}
+        raw_rules = []
+        commands = None
+
+        for line in lines:
+            if line.startswith('\t'):
+                if commands is not None:
+                    command = line.strip()
+
+                    # Handle the prefixes that make interprets.
+                    ignore_errors = False
+
+                    while command[:1] in ('-', '@'):
+                        if command[0] == '-':
+                            ignore_errors = True
+
+                        command = command[1:].lstrip()
+
+                    if command:
+                        commands.append((command, ignore_errors))
+
+                continue
+
+            commands = None
+
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            m = re.match(r'([A-Za-z0-9_]+)\s*=(.*)', line)
+            if m is not None:
+                variables[m.group(1)] = m.group(2).strip()
+                continue
+
+            # Ignore special targets and suffix rules.
+            if line.startswith('.'):
+                continue
+
+            targets, colon, deps = line.partition(':')
+            if colon:
+                commands = []
+                raw_rules.append((targets, deps, commands))
+
+        # Now that all variables are known, expand the rules.
+        rules = {}
+
+        for targets, deps, commands in raw_rules:
+            deps = [d for d in cls._expand(deps, variables).split()
+                    if d != 'FORCE']
+
+            expanded_commands = []
+
+            for command, ignore_errors in commands:
+                command = cls._expand(command, variables)
+
+                if ignore_errors:
+                    command = '({0} || true)'.format(command)
+
+                expanded_commands.append(command)
+
+            for target in cls._expand(targets, variables).split():
+                rules[target] = (deps, expanded_commands)
+
+        return variables, rules
+
+    @staticmethod
+    def _quote(path):
+        """ Return a path with quotes added if it contains spaces. """
+
+        if ' ' in path:
+            path = '"{}"'.format(path)
+
+        return path
+
+    @staticmethod
+    def _read_file(fname):
+        """ Return the contents of a text file or None if it couldn't be read.
+        """
+
+        try:
+            with open(fname) as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _reflink(source, target):
+        """ Create a copy-on-write clone of a file and return True if the
+        filesystem supports it.
+        """
+
+        # Cloning is only supported on Linux.
+        if not sys.platform.startswith('linux'):
+            return False
+
+        import fcntl
+
+        # This is the value of the FICLONE ioctl.
+        ficlone = 0x40049409
+
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), ficlone, src.fileno())
+        except OSError:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+
+            return False
+
+        shutil.copystat(source, target)
+
+        return True
+
+    @staticmethod
+    def _remove_file(fname):
+        """ Remove a file which may or may not exist. """
+
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
+
+    def _remove_compile_report(self):
+        """ Remove any resources used to compile each source file recorded by
+        a previous build.
+        """
+
+        if self.compile_report:
+            shutil.rmtree(self._get_compile_report_dir(), ignore_errors=True)
+
+    def _report_launcher_stats(self, previous_stats):
+        """ Report the compiler launcher's cache hits and misses since the
+        statistics were previously obtained.
+        """
+
+        if previous_stats is None:
+            return
+
+        stats = self._get_launcher_stats()
+        if stats is None:
+            return
+
+        hits = stats[0] - previous_stats[0]
+        misses = stats[1] - previous_stats[1]
+
+        # The statistics may have been reset by something else.
+        if hits < 0 or misses < 0:
+            return
+
+        total = hits + misses
+        if total == 0:
+            return
+
+        self.project.progress(
+                "{0}: {1} cache hits, {2} misses ({3}% hit rate)".format(
+                        os.path.basename(self.compiler_launcher), hits,
+                        misses, round(hits * 100 / total)))
+
+    def _restore_previous_build(self, target_dir, key_file, key):
+        """ Restore the unchanged parts of the previous build.  A file that has
+        been regenerated with the same contents is replaced by the previous
+        copy so that its timestamp is preserved and it isn't recompiled.  A
+        file that is missing from the new build (ie. one created by qmake or
+        make) is only restored to the top-level build directory or to the build
+        directory of a module that is still being built with the same .pro
+        file, qmake, spec and settings.  Nothing is restored to the directory
+        that the project is being built for (eg. the staging directory of a
+        wheel).
+        """
+
+        project = self.project
+
+        project.progress("Restoring the unchanged parts of the previous build")
+
+        previous_build_dir = self._previous_build_dir
+        build_dir = os.path.abspath(project.build_dir)
+        target_dir = os.path.abspath(target_dir)
+
+        # The Makefiles generated by qmake don't make the object files depend
+        # on the compiler flags so the object files (and anything linked from
+        # them) of a module that is configured differently must not be
+        # restored.  The flags used with profile guided optimisation depend on
+        # the phase of the build so nothing made by a previous build is used.
+        same_makefiles = (not self.pgo and self._read_file(
+                os.path.join(previous_build_dir,
+                        os.path.relpath(key_file, build_dir))) == key)
+
+        module_build_dirs = []
+
+        for buildable in project.buildables:
+            if not isinstance(buildable, BuildableModule):
+                continue
+
+            module_build_dir = os.path.abspath(buildable.build_dir)
+            pro_name = os.path.join(
+                    os.path.relpath(module_build_dir, build_dir),
+                    buildable.name + '.pro')
+
+            previous_pro = self._read_file(
+                    os.path.join(previous_build_dir, pro_name))
+
+            if same_makefiles and previous_pro == self._read_file(
+                    os.path.join(build_dir, pro_name)):
+                module_build_dirs.append(module_build_dir)
+
+        for dirpath, dirnames, filenames in os.walk(previous_build_dir):
+            current_dir = os.path.normpath(
+                    os.path.join(build_dir,
+                            os.path.relpath(dirpath, previous_build_dir)))
+
+            # Don't restore anything to the target directory.
+            dirnames[:] = [d for d in dirnames
+                    if os.path.join(current_dir, d) != target_dir]
+
+            restore_missing = (current_dir == build_dir)
+
+            for module_build_dir in module_build_dirs:
+                if current_dir == module_build_dir or current_dir.startswith(
+                        module_build_dir + os.sep):
+                    restore_missing = True
+                    break
+
+            for filename in filenames:
+                previous = os.path.join(dirpath, filename)
+                current = os.path.join(current_dir, filename)
+
+                if not os.path.exists(current):
+                    if restore_missing:
+                        os.makedirs(current_dir, exist_ok=True)
+                        os.replace(previous, current)
+                elif filecmp.cmp(previous, current, shallow=False):
+                    os.replace(previous, current)
+
+        shutil.rmtree(previous_build_dir, ignore_errors=True)
+        self._previous_build_dir = None
+
+    def _run_command(self, args, *, cwd=None, fatal=True):
+        """ Run a command and display the output if requested.  If a working
+        directory is specified then the output is captured and displayed when
+        the command completes so that this may be called from any thread.
+        """
+
+        project = self.project
+
+        if cwd is None:
+            project.run_command(args, fatal=fatal)
+            return
+
+        cmd = ' '.join(args)
+
+        result = subprocess.run(cmd, shell=True, cwd=cwd,
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+
+        failed = (result.returncode != 0 and fatal)
+
+        if project.verbose or failed:
+            lines = str(result.stdout, encoding=locale.getpreferredencoding(),
+                    errors='ignore').splitlines(keepends=True)
+
+            with self._output_lock:
+                if project.verbose:
+                    print(cmd, flush=True)
+                else:
+                    if len(lines) > 100:
+                        lines = lines[-100:]
+                        lines.append(
+                                "To see the full output use the --verbose "
+                                "option.\n")
+
+                sys.stdout.writelines(lines)
+                sys.stdout.flush()
+
+        if failed:
+            raise UserException(
+                    "'{0}' failed returning {1}".format(cmd,
+                            result.returncode))
+
+    def _run_make(self, exe, debug, fatal=True, cwd=None):
+        """ Run make against a Makefile to create an executable.  Returns the
+        platform specific name of the executable, or None if an executable
+        wasn't created.  The Makefile must be in the current directory unless
+        a working directory is specified.
+        """
+
+        makefile_target, platform_exe = self._get_platform_exe(exe, debug)
+
+        platform_exe_path = platform_exe
+        if cwd is not None:
+            platform_exe_path = os.path.join(cwd, platform_exe_path)
+
         # Make sure the executable doesn't exist.
-        self._remove_file(platform_exe)
+        self._remove_file(platform_exe_path)
 
         args = [self._find_make()]
 
         if makefile_target is not None:
             args.append(makefile_target)
 
-        project.run_command(args, fatal=fatal)
+        self._run_command(args, cwd=cwd, fatal=fatal)
 
-        return platform_exe if os.path.isfile(platform_exe) else None
+        return platform_exe if os.path.isfile(platform_exe_path) else None
 
-    def _run_project_make(self, install=False):
+    def _run_project_make(self, install=False, pgo_flags=None):
         """ Run make on the project.  The Makefile must be in the current
         directory.
         """
 
         project = self.project
 
-        args = [self._find_make()]
+        make = self._find_make()
+        args = [make]
+
+        if pgo_flags:
+            args.append('PYQTBUILD_PGO_FLAGS="{}"'.format(pgo_flags))
 
         if install:
             args.append('install')
-        elif project.py_platform != 'win32' and self.jobs:
-            args.append('-j')
-            args.append(str(self.jobs))
+        elif self.jobs:
+            if make == 'jom':
+                args.append('/J')
+                args.append(str(self.jobs))
+            elif project.py_platform != 'win32':
+                args.append('-j')
+                args.append(str(self.jobs))
+
+        self._run_traced_make(args, install)
+
+    def _run_project_make_with_pgo(self, target_dir):
+        """ Run make on the project using profile guided optimisation.  The
+        Makefile must be in the current directory.
+        """
 
-        project.run_command(args)
+        project = self.project
+
+        clang = 'clang' in self.spec
+
+        profile_dir = os.path.join(os.path.abspath(project.build_dir),
+                'pgo-profile')
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        os.makedirs(profile_dir)
+
+        # Build the instrumented modules.
+        project.progress("Compiling the instrumented project")
+        self._run_project_make(pgo_flags='-fprofile-generate=' + profile_dir)
+
+        # Install them in a staging directory so that they can be imported.
+        project.progress("Installing the instrumented project")
+
+        staging_dir = os.path.join(os.path.abspath(project.build_dir),
+                'pgo-staging')
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+        project.run_command([self._find_make(),
+                'INSTALL_ROOT=' + self._quote(staging_dir), 'install'])
+
+        # Run the training script.
+        project.progress("Running the profile guided optimisation script")
+
+        env = dict(os.environ)
+        python_path = [os.path.join(staging_dir,
+                os.path.abspath(target_dir).lstrip(os.sep))]
+
+        if env.get('PYTHONPATH'):
+            python_path.append(env['PYTHONPATH'])
+
+        env['PYTHONPATH'] = os.pathsep.join(python_path)
+
+        try:
+            subprocess.run([sys.executable, self.pgo], env=env,
+                    cwd=project.root_dir, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise UserException(
+                    "The profile guided optimisation script '{0}' "
+                    "failed".format(self.pgo), detail=str(e))
+
+        # Clang's raw profiles must be merged before they can be used.
+        if clang:
+            profdata = os.path.join(profile_dir, 'default.profdata')
+
+            llvm_profdata = self._find_exe('llvm-profdata')
+            if llvm_profdata is not None:
+                args = [self._quote(llvm_profdata)]
+            elif sys.platform == 'darwin':
+                args = ['xcrun', 'llvm-profdata']
+            else:
+                raise UserException(
+                        "'llvm-profdata' could not be found on PATH")
+
+            args.append('merge')
+            args.append('-output=' + self._quote(profdata))
+
+            for profraw in glob.glob(os.path.join(profile_dir, '*.profraw')):
+                args.append(self._quote(profraw))
+
+            project.run_command(args)
+
+            pgo_flags = '-fprofile-use=' + profdata
+        else:
+            pgo_flags = ('-fprofile-use=' + profile_dir +
+                    ' -fprofile-correction -Wno-missing-profile')
+
+        # Rebuild the modules using the profile.
+        project.progress("Compiling the optimised project")
+        project.run_command([self._find_make(), 'clean'])
+        self._run_project_make(pgo_flags=pgo_flags)
+
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _run_traced_make(self, args, install):
+        """ Run make and display the output in the same way as
+        Project.run_command().  The time spent making each sub-directory (as
+        reported by GNU make) and creating the .dist-info directory is added to
+        the trace.
+        """
+
+        project = self.project
+        trace = self.build_trace
+
+        deck = None if project.verbose else collections.deque((), 100)
+        nr_lines = 0
+
+        directory_re = re.compile(
+                r"\S*make(\[\d+\])?: (Entering|Leaving) directory "
+                r"[`'\"](.*)['\"]")
+        sip_distinfo = os.path.basename(self._sip_distinfo)
+
+        started = {}
+        lanes = set()
+        distinfo_start = None
 
-    def _run_qmake(self, pro_name, fatal=True, recursive=False):
+        try:
+            for line in project.read_command_pipe(args, and_stderr=True):
+                nr_lines += 1
+
+                m = directory_re.match(line)
+                if m is not None:
+                    directory = m.group(3)
+
+                    if m.group(2) == 'Entering':
+                        # Each concurrent sub-make is shown in its own lane.
+                        lane = 1
+                        while lane in lanes:
+                            lane += 1
+
+                        lanes.add(lane)
+                        started.setdefault(directory, []).append(
+                                (trace.now(), lane))
+                    elif started.get(directory):
+                        start, lane = started[directory].pop()
+                        lanes.discard(lane)
+
+                        end = trace.now()
+                        module = os.path.basename(directory)
+
+                        trace.add(
+                                "{0} {1}".format(
+                                        "Installing" if install else "Making",
+                                        module),
+                                'make', start, end, lane=lane)
+
+                        if not install:
+                            self._module_durations[module] = max(
+                                    self._module_durations.get(module, 0),
+                                    end - start)
+                elif distinfo_start is None and sip_distinfo in line:
+                    distinfo_start = trace.now()
+
+                if deck is None:
+                    sys.stdout.write(line)
+                else:
+                    deck.append(line)
+        except UserException:
+            if deck is not None:
+                for line in deck:
+                    sys.stdout.write(line)
+
+                if nr_lines > deck.maxlen:
+                    sys.stdout.write(
+                            "To see the full output use the --verbose "
+                            "option.\n")
+
+            raise
+        finally:
+            # The .dist-info directory is created last.
+            if distinfo_start is not None:
+                trace.add("Creating the .dist-info directory", 'distinfo',
+                        distinfo_start, trace.now())
+
+    def _run_qmake(self, pro_name, fatal=True, recursive=False, cwd=None):
         """ Run qmake against a .pro file.  fatal is set if a qmake failure is
         considered a fatal error, otherwise False is returned if qmake fails.
-        The current directory must contain the .pro file.
+        The current directory must contain the .pro file unless a working
+        directory is specified.
         """
 
         # Make sure the Makefile doesn't exist.
         mf_name = 'Makefile'
+        if cwd is not None:
+            mf_name = os.path.join(cwd, mf_name)
+
         self._remove_file(mf_name)
 
         # Build the command line.
@@ -658,7 +2263,7 @@ macx {
 
         args.append(os.path.basename(pro_name))
 
-        self.project.run_command(args, fatal=fatal)
+        self._run_command(args, cwd=cwd, fatal=fatal)
 
         # Check that the Makefile was created.
         if os.path.isfile(mf_name):
@@ -671,6 +2276,70 @@ macx {
 
         return False
 
+    def _run_sip_distinfo(self, distinfo_dir, wheel_tag, inventory_fn):
+        """ Run sip-distinfo to create a .dist-info directory for the files
+        listed in an inventory.
+        """
+
+        project = self.project
+
+        args = project.get_sip_distinfo_command_line(
+                self._quote(self._sip_distinfo), self._quote(inventory_fn),
+                generator='pyqtbuild', generator_version=PYQTBUILD_VERSION_STR,
+                wheel_tag=wheel_tag)
+
+        # The files have been installed directly in the target directory
+        # rather than below $(INSTALL_ROOT), and the arguments are being
+        # passed to a shell rather than being written to a .pro file.
+        prefix = args.index('--prefix')
+        del args[prefix:prefix + 2]
+
+        args = [arg.replace('\\"', '"') for arg in args]
+        args.append(self._quote(distinfo_dir))
+
+        project.run_command(args)
+
+    def _save_module_durations(self):
+        """ Save the time it took to make each module so that later builds
+        can use it.
+        """
+
+        # An incremental build doesn't reflect the cost of making a module.
+        if self.build_cache is None or self.incremental:
+            return
+
+        if not self._module_durations:
+            return
+
+        # Keep the history of any modules that weren't made this time.
+        module_durations = self._get_module_durations()
+        module_durations.update(self._module_durations)
+
+        self.build_cache.set('module-durations',
+                self._get_module_durations_key(), module_durations)
+
+    def _save_previous_build(self):
+        """ Move any previous build out of the way so that it isn't removed
+        along with the build directory.
+        """
+
+        project = self.project
+
+        build_dir = os.path.abspath(project.build_dir)
+        if not os.path.isdir(build_dir) or not os.listdir(build_dir):
+            return
+
+        previous_build_dir = build_dir + '.previous'
+        shutil.rmtree(previous_build_dir, ignore_errors=True)
+
+        try:
+            os.rename(build_dir, previous_build_dir)
+        except OSError:
+            # Just do a full build.
+            return
+
+        self._previous_build_dir = previous_build_dir
+
     def _update_pro_file(self, pro_lines, buildable):
         """ Update a .pro file from a buildable. """
 
@@ -736,10 +2405,262 @@ macx {
             objects = [self.qmake_quote(f) for f in buildable.objects]
             pro_lines.append('OBJECTS += {}'.format(' '.join(objects)))
 
+        # Run the compiler using any launcher.  Note that the linker is not
+        # wrapped as the launchers don't cache the results of linking.
+        if self.compiler_launcher:
+            launcher = self._quote(self.compiler_launcher)
+            pro_lines.append('QMAKE_CC = {} $$QMAKE_CC'.format(launcher))
+            pro_lines.append('QMAKE_CXX = {} $$QMAKE_CXX'.format(launcher))
+
+    def _verify_interpreters(self):
+        """ Check that the modules that use the limited API can be compiled
+        against the Python.h of each interpreter to be verified.  Only the
+        syntax of each source file is checked so nothing is recompiled.
+        """
+
+        project = self.project
+
+        buildables = [b for b in project.buildables
+                if isinstance(b, BuildableModule) and b.uses_limited_api]
+
+        if not buildables:
+            raise UserException(
+                    "Interpreters can only be verified if a module uses the "
+                    "limited API")
+
+        for interpreter in self.verify_interpreters:
+            include_dir = self._get_interpreter_include_dir(interpreter,
+                    buildables)
+
+            project.progress(
+                    "Verifying the modules against {0}".format(include_dir))
+
+            with self.build_trace.span(
+                    "Verifying against {0}".format(interpreter), 'verify'):
+                with ThreadPoolExecutor(
+                        max_workers=self.jobs or None) as executor:
+                    futures = []
+
+                    for buildable in buildables:
+                        for args in self._get_syntax_check_commands(
+                                buildable, include_dir):
+                            futures.append(
+                                    executor.submit(self._run_command, args,
+                                            cwd=buildable.build_dir))
+
+                    for future in futures:
+                        future.result()
+
+    def _write_compile_report(self):
+        """ Display a ranked report of the resources used to compile each
+        module and source file and write it to a JSON file.
+        """
+
+        if not self.compile_report:
+            return
+
+        project = self.project
+
+        files = []
+
+        for report_path in glob.glob(
+                os.path.join(self._get_compile_report_dir(), '*.json')):
+            try:
+                with open(report_path) as f:
+                    files.append(json.load(f))
+            except (OSError, ValueError):
+                pass
+
+        # Rank by CPU time if it is known, otherwise by wall time.
+        def cost(entry):
+            cpu_time = entry['cpu_time']
+
+            return entry['wall_time'] if cpu_time is None else cpu_time
+
+        modules = {}
+
+        for entry in files:
+            module = modules.setdefault(entry['module'],
+                    {'module': entry['module'], 'files': 0, 'wall_time': 0.0,
+                            'cpu_time': None, 'peak_rss': None})
+
+            module['files'] += 1
+            module['wall_time'] += entry['wall_time']
+
+            if entry['cpu_time'] is not None:
+                module['cpu_time'] = ((module['cpu_time'] or 0.0) +
+                        entry['cpu_time'])
+
+            if entry['peak_rss'] is not None:
+                module['peak_rss'] = max(module['peak_rss'] or 0,
+                        entry['peak_rss'])
+
+        modules = sorted(modules.values(), key=cost, reverse=True)
+        files.sort(key=cost, reverse=True)
+
+        try:
+            with open(self.compile_report, 'w') as f:
+                json.dump({'modules': modules, 'files': files}, f, indent=1)
+        except OSError as e:
+            raise UserException(
+                    "Unable to write the compile report to '{0}'".format(
+                            self.compile_report),
+                    detail=str(e))
+
+        if project.quiet or not files:
+            return
+
+        def format_row(name, entry):
+            cpu_time = entry['cpu_time']
+            peak_rss = entry['peak_rss']
+
+            return '{0:<40} {1:>9.1f} {2:>9} {3:>9}'.format(name,
+                    entry['wall_time'],
+                    '-' if cpu_time is None else '{:.1f}'.format(cpu_time),
+                    '-' if peak_rss is None else str(
+                            peak_rss // (1024 * 1024)))
+
+        def format_header(name):
+            return '{0:<40} {1:>9} {2:>9} {3:>9}'.format(name, 'Wall (s)',
+                    'CPU (s)', 'RSS (MB)')
+
+        print()
+        print(format_header('Module'))
+
+        for module in modules:
+            print(format_row(
+                    '{0} ({1} files)'.format(module['module'],
+                            module['files']),
+                    module))
+
+        # Only show the most expensive source files.
+        print()
+        print(format_header('Source file'))
+
+        for entry in files[:20]:
+            print(format_row(
+                    '{0}/{1}'.format(entry['module'], entry['source']),
+                    entry))
+
+        print()
+
+        project.progress(
+                "The compile report has been written to {0}".format(
+                        self.compile_report))
+
+    def _write_distinfo(self, target_dir, wheel_tag, records):
+        """ Write the .dist-info directory for the files installed in a target
+        directory using the RECORD entries computed when they were installed.
+        """
+
+        project = self.project
+
+        distinfo_dir = project.get_distinfo_dir(target_dir)
+
+        # Create everything apart from the RECORD entries of the installed
+        # files (by giving sip-distinfo an empty inventory) so that they are
+        # not read again.
+        inventory_fn = os.path.join(project.build_dir, 'empty-inventory.txt')
+        project.open_for_writing(inventory_fn).close()
+
+        self._run_sip_distinfo(distinfo_dir, wheel_tag, inventory_fn)
+
+        record_fn = os.path.join(distinfo_dir, 'RECORD')
+
+        try:
+            with open(record_fn) as f:
+                distinfo_lines = f.read().splitlines()
+        except OSError as e:
+            raise UserException(
+                    "Unable to read '{0}'".format(record_fn), detail=str(e))
+
+        # Name the files in the same way as sip-distinfo.
+        distinfo_path = os.path.dirname(distinfo_dir)
+        norm_distinfo_path = os.path.normcase(distinfo_path)
+
+        record_lines = []
+
+        for fn in sorted(records):
+            if '__pycache__' in fn.split(os.sep):
+                continue
+
+            norm_fn = os.path.normcase(fn)
+
+            if norm_fn.startswith(norm_distinfo_path):
+                fn_name = fn[len(distinfo_path) + 1:]
+            elif norm_fn.startswith(sys.prefix):
+                fn_name = os.path.relpath(fn, distinfo_path)
+            else:
+                fn_name = fn
+
+            digest, size = records[fn]
+
+            record_lines.append(
+                    '{0},sha256={1},{2}'.format(fn_name.replace('\\', '/'),
+                            digest, size))
+
+        self._write_file(record_fn,
+                '\n'.join(record_lines + distinfo_lines) + '\n')
+
+    def _write_executable_pro_file(self, buildable):
+        """ Write the .pro file for an executable and return its name. """
+
+        # The name of the .pro file.
+        pro_path = os.path.join(buildable.build_dir, buildable.target + '.pro')
+
+        # Create the .pro file.
+        pro_lines = []
+
+        self._update_pro_file(pro_lines, buildable)
+
+        pf = self.project.open_for_writing(pro_path)
+        pf.write('\n'.join(pro_lines))
+        pf.close()
+
+        return pro_path
+
+    def _write_file(self, fname, contents):
+        """ Write the contents of a file unless it already has those contents.
+        This preserves the timestamp of an unchanged file.
+        """
+
+        try:
+            with open(fname) as f:
+                if f.read() == contents:
+                    return
+        except (OSError, ValueError):
+            pass
+
+        f = self.project.open_for_writing(fname)
+        f.write(contents)
+        f.close()
+
     def _write_pro_file(self, pro_fn, pro_lines):
         """ Write a .pro file. """
 
-        pro = self.project.open_for_writing(pro_fn)
-        pro.write('\n'.join(pro_lines))
-        pro.write('\n')
-        pro.close()
+        self._write_file(pro_fn, '\n'.join(pro_lines) + '\n')
+
+    def _write_trace(self, *, fatal=True):
+        """ Write the trace of the build if required.  If fatal is False (eg.
+        because the build has already failed) then an error is reported rather
+        than raised.
+        """
+
+        if self.trace:
+            try:
+                self.build_trace.write(self.trace)
+            except OSError as e:
+                if fatal:
+                    raise UserException(
+                            "Unable to write the trace to '{0}'".format(
+                                    self.trace),
+                            detail=str(e))
+
+                self.project.progress(
+                        "Unable to write the trace to '{0}': {1}".format(
+                                self.trace, e))
+                return
+
+            self.project.progress(
+                    "The trace of the build has been written to {0}".format(
+                            self.trace))
@@ -58,9 +58,11 @@ class AbstractPackage(ABC):
         # This default implementation does nothing.
 
     def bundle_qt(self, target_qt_dir, platform_tag, exclude, ignore_missing,
-            bindings=True, subwheel=None):
-        """ Bundle the relevant parts of the Qt installation.  Returns True if
-        the LGPL applies to all bundled parts.
+            wheel_names=None, subwheel=None):
+        """ Bundle the relevant parts of the Qt installation.  wheel_names is
+        the set of the names of the files in the wheel containing the bindings
+        or None if there are no bindings.  Returns True if the LGPL applies to
+        all bundled parts.
         """
 
         # Architecture-specific values.
@@ -96,10 +98,11 @@ class AbstractPackage(ABC):
 
             # See if we need to check if the bindings are present to decide to
             # bundle this part of Qt.
-            if bindings:
+            if wheel_names is not None:
                 # Find the bindings.
                 for ext in module_extensions:
-                    if os.path.isfile(os.path.join(package_dir, name + ext)):
+                    module_name = os.path.join(package_dir, name + ext)
+                    if module_name.replace(os.sep, '/') in wheel_names:
                         break
                 else:
                     verbose(
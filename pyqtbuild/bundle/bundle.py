@@ -11,12 +11,15 @@ from sipbuild import UserException
 
 from . import packages
 from .abstract_package import AbstractPackage
+from .manifest import get_manifest, set_manifest
 from .verbose import verbose
-from .wheel import create_wheel, unpack_wheel, write_record_file
+from .wheel import (get_wheel_files, open_wheel, read_record_file,
+        WheelWriter)
 
 
 def bundle(wheel_path, qt_dir, build_tag_suffix, msvc_runtime, openssl,
-        openssl_dir, exclude, ignore_missing, arch):
+        openssl_dir, exclude, ignore_missing, arch, buffer_size=None,
+        compress_jobs=None):
     """ Bundle a Qt installation with a PyQt wheel. """
 
     wheel_path = os.path.abspath(wheel_path)
@@ -91,78 +94,141 @@ def bundle(wheel_path, qt_dir, build_tag_suffix, msvc_runtime, openssl,
 
     platform_tag = bundled_wheel_dir.split('-')[-1]
 
-    # Create the directory to contain the existing wheel contents.
-    shutil.rmtree(bundled_wheel_dir, ignore_errors=True)
-    os.mkdir(bundled_wheel_dir)
+    # Read the contents of the existing wheel.  Its entries are copied to the
+    # bundled wheel without being unpacked.
+    verbose("Reading {0}".format(wheel_name))
 
-    # Unpack the existing wheel.
-    saved_cwd = os.getcwd()
-    os.chdir(bundled_wheel_dir)
+    with open_wheel(wheel_path) as zf:
+        entries = [zi for zi in zf.infolist() if not zi.is_dir()]
+
+        # Find the .dist-info directory.
+        for zi in entries:
+            distinfo_dir, _, base_name = zi.filename.partition('/')
+            if (fnmatch.fnmatch(distinfo_dir, '*.dist-info') and
+                    base_name == 'RECORD'):
+                break
+        else:
+            raise UserException(
+                    "'{0}' doesn't contain a .dist-info directory".format(
+                            wheel_path))
+
+        record_name = distinfo_dir + '/RECORD'
+        metadata_name = distinfo_dir + '/METADATA'
+
+        record = read_record_file(zf, record_name)
+        metadata = zf.read(metadata_name).decode('utf-8')
 
-    verbose("Unpacking {0}".format(wheel_name))
-    unpack_wheel(wheel_path)
+    wheel_names = set([zi.filename for zi in entries])
 
     # Remove any existing bundled Qt installation while protecting some
     # specific directories.
     verbose("Removing any existing Qt bundle")
 
     target_qt_dir = package.get_target_qt_dir()
-    if os.path.isdir(target_qt_dir):
-        for fn in os.listdir(target_qt_dir):
-            if fn not in ('qsci', ):
-                shutil.rmtree(os.path.join(target_qt_dir, fn),
-                        ignore_errors=True)
-
-    # Bundle the relevant parts of the Qt installation.
-    package.bundle_qt(target_qt_dir, platform_tag, exclude, ignore_missing)
-
-    if platform_tag in ('win32', 'win_amd64'):
-        # Bundle the MSVC runtime if required.
-        if msvc_runtime:
-            package.bundle_msvc_runtime(target_qt_dir, platform_tag)
-
-        # Bundle OpenSSL if required.
-        if openssl:
-            package.bundle_openssl(target_qt_dir, openssl_dir, platform_tag)
-
-    # Find the .dist-info directory.
-    for distinfo_dir in os.listdir('.'):
-        if fnmatch.fnmatch(distinfo_dir, '*.dist-info'):
-            break
-    else:
-        raise UserException(
-                "'{0}' doesn't contain a .dist-info directory".format(
-                        wheel_path))
+    target_qt_prefix = target_qt_dir.replace(os.sep, '/') + '/'
+
+    def is_bundled_qt(name):
+        if not name.startswith(target_qt_prefix):
+            return False
+
+        return name[len(target_qt_prefix):].split('/')[0] not in ('qsci', )
+
+    entries = [zi for zi in entries if not is_bundled_qt(zi.filename)]
+
+    # Create the directory to contain the parts of the Qt installation.
+    shutil.rmtree(bundled_wheel_dir, ignore_errors=True)
+    os.mkdir(bundled_wheel_dir)
 
-    # Remove any dependency on an external Qt wheel from the METADATA file.
-    update_metadata = False
-    updated_metadata = ''
-    qt_wheel = package_title + '-Qt'
-    metadata_path = os.path.join(distinfo_dir, 'METADATA')
+    saved_cwd = os.getcwd()
+    os.chdir(bundled_wheel_dir)
+
+    writer = None
+
+    try:
+        # Bundle the relevant parts of the Qt installation.  Only the files
+        # that have to be modified are copied to the staging directory.  The
+        # rest are added to the wheel directly from the Qt installation.
+        set_manifest(True)
+
+        package.bundle_qt(target_qt_dir, platform_tag, exclude, ignore_missing,
+                wheel_names=wheel_names)
 
-    with open(metadata_path) as f:
-        for line in f:
+        if platform_tag in ('win32', 'win_amd64'):
+            # Bundle the MSVC runtime if required.
+            if msvc_runtime:
+                package.bundle_msvc_runtime(target_qt_dir, platform_tag)
+
+            # Bundle OpenSSL if required.
+            if openssl:
+                package.bundle_openssl(target_qt_dir, openssl_dir,
+                        platform_tag)
+
+        # Remove any dependency on an external Qt wheel from the METADATA file.
+        update_metadata = False
+        updated_metadata = ''
+        qt_wheel = package_title + '-Qt'
+
+        for line in metadata.splitlines(keepends=True):
             if 'Requires-Dist:' in line and qt_wheel in line:
                 update_metadata = True
             else:
                 updated_metadata += line
 
-    if update_metadata:
-        verbose("Updating the METADATA file")
+        # Create the bundled wheel.  The existing entries are copied first,
+        # then the Qt installation and then the .dist-info directory.  Only the
+        # METADATA file (if it has changed), the Qt files and the RECORD file
+        # are compressed.
+        verbose("Writing {0}".format(bundled_wheel_name))
+
+        writer = WheelWriter(bundled_wheel_path, buffer_size=buffer_size,
+                compress_jobs=compress_jobs)
 
-        with open(metadata_path, 'w') as f:
-            f.write(updated_metadata)
+        with open(wheel_path, 'rb') as wheel_f:
+            distinfo_entries = []
 
-    # Rewrite the wheel's RECORD file.
-    verbose("Writing the RECORD file")
-    names = write_record_file(distinfo_dir)
+            for zi in entries:
+                if zi.filename.startswith(distinfo_dir + '/'):
+                    distinfo_entries.append(zi)
+                else:
+                    _copy_entry(writer, wheel_f, zi, record, wheel_name)
 
-    # Create the bundled wheel.
-    verbose("Writing {0}".format(bundled_wheel_name))
-    create_wheel(bundled_wheel_path, names)
+            writer.write_files(get_wheel_files(get_manifest()))
+
+            for zi in distinfo_entries:
+                if zi.filename == record_name:
+                    continue
+
+                if zi.filename == metadata_name and update_metadata:
+                    verbose("Updating the METADATA file")
+                    writer.write_data(metadata_name,
+                            updated_metadata.encode('utf-8'))
+                else:
+                    _copy_entry(writer, wheel_f, zi, record, wheel_name)
+
+        writer.close(record_name)
+    except BaseException:
+        # Don't leave an incomplete wheel.
+        if writer is not None:
+            writer.discard()
+
+        raise
+    finally:
+        set_manifest(False)
+        os.chdir(saved_cwd)
 
     # Tidy up.
-    os.chdir(saved_cwd)
     shutil.rmtree(bundled_wheel_dir)
 
     verbose("Bundling complete.")
+
+
+def _copy_entry(writer, wheel_f, zi, record, wheel_name):
+    """ Copy an entry of the existing wheel to the bundled wheel. """
+
+    record_line = record.get(zi.filename)
+    if record_line is None:
+        raise UserException(
+                "'{0}' is not in the RECORD file of '{1}'".format(zi.filename,
+                        wheel_name))
+
+    writer.copy_entry(wheel_f, zi, record_line)
@@ -12,6 +12,7 @@ from ..version import PYQTBUILD_VERSION_STR
 
 from .bundle import bundle
 from .verbose import set_verbose
+from .wheel import DEFAULT_BUFFER_SIZE
 
 
 def main():
@@ -31,9 +32,18 @@ def main():
         parser.add_argument('--arch', choices=('x86_64', 'arm64'),
                 help="the architecture to bundle")
 
+    parser.add_argument('--buffer-size', metavar='N', type=int,
+            default=DEFAULT_BUFFER_SIZE,
+            help="read the files added to the wheel N bytes at a time "
+                    "[default: %(default)s]")
+
     parser.add_argument('--build-tag-suffix', metavar='SUFFIX',
             help="append SUFFIX to the build tag in the wheel name")
 
+    parser.add_argument('--compress-jobs', metavar='N', type=int, default=1,
+            help="compress up to N blocks of the files concurrently "
+                    "[default: %(default)s]")
+
     parser.add_argument('--exclude', metavar="NAME", default=[],
             action='append', help="exclude the NAME bindings from the wheel")
 
@@ -60,6 +70,12 @@ def main():
 
     args = parser.parse_args()
 
+    if args.buffer_size < 1:
+        parser.error("the buffer size must be at least 1")
+
+    if args.compress_jobs < 1:
+        parser.error("the number of compress jobs must be at least 1")
+
     try:
         set_verbose(args.verbose)
 
@@ -72,7 +88,9 @@ def main():
                 build_tag_suffix=args.build_tag_suffix,
                 msvc_runtime=args.msvc_runtime, openssl=args.openssl,
                 openssl_dir=args.openssl_dir, exclude=args.exclude,
-                ignore_missing=args.ignore_missing, arch=arch)
+                ignore_missing=args.ignore_missing, arch=arch,
+                buffer_size=args.buffer_size,
+                compress_jobs=args.compress_jobs)
     except Exception as e:
         handle_exception(e)
 
@@ -0,0 +1,41 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+import os
+
+
+# The manifest of the files that are added to a wheel directly from where they
+# are rather than being copied to the wheel's staging directory first.  It is a
+# dict of source path names keyed by the name of the file in the wheel, or None
+# if all files are copied to the staging directory.
+_manifest = None
+
+
+def add_to_manifest(src, dst):
+    """ Add a file to the manifest.  dst is the path name of the file relative
+    to the staging directory.  Return False if there is no manifest and the
+    file must be copied to the staging directory instead.
+    """
+
+    if _manifest is None:
+        return False
+
+    _manifest[dst.replace(os.sep, '/')] = src
+
+    return True
+
+
+def get_manifest():
+    """ Return the manifest or None if there is no manifest. """
+
+    return _manifest
+
+
+def set_manifest(enabled):
+    """ Enable or disable the manifest.  Any existing manifest is discarded.
+    """
+
+    global _manifest
+    _manifest = {} if enabled else None
@@ -7,6 +7,7 @@ import os
 import shutil
 
 from ..abstract_package import AbstractPackage
+from ..manifest import add_to_manifest
 from ..verbose import verbose
 
 
@@ -57,7 +58,10 @@ class PyQt(AbstractPackage):
         """ Bundle the DLLs in a directory. """
 
         bin_dir = os.path.join(target_qt_dir, 'bin')
-        os.makedirs(bin_dir, exist_ok=True)
 
         for dll in os.listdir(dlls_dir):
-            shutil.copy2(os.path.join(dlls_dir, dll), bin_dir)
+            src = os.path.join(dlls_dir, dll)
+
+            if not add_to_manifest(src, os.path.join(bin_dir, dll)):
+                os.makedirs(bin_dir, exist_ok=True)
+                shutil.copy2(src, bin_dir)
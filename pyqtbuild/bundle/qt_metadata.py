@@ -10,6 +10,7 @@ import subprocess
 
 from sipbuild import UserException
 
+from .manifest import add_to_manifest, get_manifest
 from .verbose import is_verbose, verbose
 
 
@@ -243,8 +244,10 @@ class VersionedMetadata:
             macos_thin_arch, ignore_missing, skip_files=None):
         """ Bundle an executable. """
 
+        # A macOS executable is patched so it must be staged.
         exe = cls._bundle_file(name, target_qt_dir, qt_dir, platform_tag,
-                macos_thin_arch, ignore_missing, skip_files=skip_files)
+                macos_thin_arch, ignore_missing, skip_files=skip_files,
+                stage=cls._is_platform('macos', platform_tag))
 
         if exe is not None:
             if cls._is_platform('linux', platform_tag):
@@ -256,9 +259,12 @@ class VersionedMetadata:
 
     @staticmethod
     def _bundle_file(name, target_dir, src_dir, platform_tag, macos_thin_arch,
-            ignore_missing, skip_files=None, ignore=None, might_be_code=True):
+            ignore_missing, skip_files=None, ignore=None, might_be_code=True,
+            stage=False):
         """ Bundle a file (or directory) and return the name of the installed
-        file (or directory) or None if it was missing.
+        file (or directory) or None if it was missing.  Unless it is staged, a
+        file that doesn't need to be modified is added to any manifest rather
+        than being copied.
         """
 
         if skip_files is not None and name in skip_files:
@@ -267,12 +273,37 @@ class VersionedMetadata:
         src = os.path.join(src_dir, name)
         dst = os.path.join(target_dir, name)
 
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-
         if os.path.isdir(src):
-            shutil.copytree(src, dst, ignore=ignore)
+            if get_manifest() is None:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copytree(src, dst, ignore=ignore)
+            else:
+                # Add the files that shutil.copytree() would copy.
+                for dirpath, dirnames, filenames in os.walk(src,
+                        followlinks=True):
+                    if ignore is not None:
+                        ignored = ignore(dirpath, dirnames + filenames)
+                        dirnames[:] = [d for d in dirnames if d not in ignored]
+                        filenames = [f for f in filenames if f not in ignored]
+
+                    for filename in filenames:
+                        file_src = os.path.join(dirpath, filename)
+
+                        # shutil.copytree() would fail on a dangling symbolic
+                        # link so we do the same rather than leave it to when
+                        # the wheel is written.
+                        if not os.path.exists(file_src):
+                            raise UserException(
+                                    "'{0}' is a broken symbolic link in the "
+                                    "Qt installation".format(file_src))
+
+                        add_to_manifest(file_src,
+                                os.path.join(dst,
+                                        os.path.relpath(file_src, src)))
         elif os.path.isfile(src):
             if macos_thin_arch is not None and might_be_code:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+
                 stderr = None if is_verbose() else subprocess.DEVNULL
 
                 try:
@@ -286,7 +317,8 @@ class VersionedMetadata:
 
                 subprocess.run(['codesign', '--force', '--sign', '-', dst],
                         stderr=stderr, check=True)
-            else:
+            elif stage or not add_to_manifest(src, dst):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
                 shutil.copy2(src, dst)
         elif ignore_missing:
             verbose("Ignoring missing '{0}'".format(name))
@@ -331,7 +363,11 @@ class VersionedMetadata:
     def _create_qt_conf(exe):
         """ Create a qt.conf file for an executable. """
 
-        qt_conf = os.path.join(os.path.dirname(exe), 'qt.conf')
+        exe_dir = os.path.dirname(exe)
+        qt_conf = os.path.join(exe_dir, 'qt.conf')
+
+        # The executable itself may not have been staged.
+        os.makedirs(exe_dir, exist_ok=True)
 
         with open(qt_conf, 'w') as f:
             f.write('[Paths]\nPrefix = ..\n')
@@ -9,12 +9,14 @@ import shutil
 from sipbuild import UserException
 
 from . import packages
+from .manifest import get_manifest, set_manifest
 from .verbose import verbose
-from .wheel import create_wheel, write_record_file
+from .wheel import get_wheel_files, WheelWriter
 
 
 def qt_wheel(package, qt_dir, build_tag, suffix, msvc_runtime, openssl,
-        openssl_dir, exclude, arch, subwheel):
+        openssl_dir, exclude, arch, subwheel, buffer_size=None,
+        compress_jobs=None):
     """ Create a wheel containing the subset of a Qt installation required for
     a particular PyQt package.
     """
@@ -131,68 +133,88 @@ def qt_wheel(package, qt_dir, build_tag, suffix, msvc_runtime, openssl,
     saved_cwd = os.getcwd()
     os.chdir(wheel_name)
 
-    # Bundle the relevant parts of the Qt installation.
-    target_qt_dir = package.get_target_qt_dir()
-    lgpl = package.bundle_qt(target_qt_dir, platform_tag, exclude,
-            ignore_missing=True, bindings=False, subwheel=subwheel)
-
-    if platform_tag in ('win32', 'win_amd64', 'win_arm64'):
-        # Bundle the MSVC runtime if required.
-        if msvc_runtime:
-            package.bundle_msvc_runtime(target_qt_dir, platform_tag)
-
-        # Bundle OpenSSL if required.
-        if openssl:
-            package.bundle_openssl(target_qt_dir, openssl_dir, platform_tag)
-
-    # Create the .dist-info directory and populate it from the prototypes.
-    os.mkdir(distinfo_dir)
-
-    proto_dir = os.path.join(os.path.dirname(__file__), 'qt_wheel_distinfo')
-    for proto in os.listdir(proto_dir):
-        src = os.path.join(proto_dir, proto)
-        dst = os.path.join(distinfo_dir, proto)
-
-        if proto == 'METADATA':
-            with open(src) as s:
-                metadata = s.read()
-
-            metadata = metadata.replace('@RB_PACKAGE@', package_title)
-            metadata = metadata.replace('@RB_PACKAGE_NAME@', package_full_name)
-            metadata = metadata.replace('@RB_PACKAGE_REQUIRES@',
-                    package_requires)
-            metadata = metadata.replace('@RB_VERSION@', version_str)
-            metadata = metadata.replace('@RB_LICENSE@',
-                    "LGPL v3" if lgpl else "GPL v3")
-
-            with open(dst, 'w') as d:
-                d.write(metadata)
-        elif proto == 'WHEEL':
-            with open(src) as s:
-                wheel_data = s.read()
-
-            with open(dst, 'w') as d:
-                d.write(wheel_data)
-                d.write('Tag: {}\n'.format(tag))
-
-                if build_tag:
-                    d.write('Build: {}\n'.format(build_tag))
-        elif proto.startswith('LICENSE.'):
-            if proto.endswith('.lgpl3' if lgpl else '.gpl3'):
-                shutil.copy(src, os.path.join(distinfo_dir, 'LICENSE'))
-        else:
-            shutil.copy(src, dst)
+    writer = None
+
+    try:
+        # Bundle the relevant parts of the Qt installation.  Only the files
+        # that have to be modified are copied to the staging directory.  The
+        # rest are added to the wheel directly from the Qt installation.
+        set_manifest(True)
+
+        target_qt_dir = package.get_target_qt_dir()
+        lgpl = package.bundle_qt(target_qt_dir, platform_tag, exclude,
+                ignore_missing=True, subwheel=subwheel)
+
+        if platform_tag in ('win32', 'win_amd64', 'win_arm64'):
+            # Bundle the MSVC runtime if required.
+            if msvc_runtime:
+                package.bundle_msvc_runtime(target_qt_dir, platform_tag)
+
+            # Bundle OpenSSL if required.
+            if openssl:
+                package.bundle_openssl(target_qt_dir, openssl_dir,
+                        platform_tag)
+
+        # Create the .dist-info directory and populate it from the prototypes.
+        os.mkdir(distinfo_dir)
+
+        proto_dir = os.path.join(os.path.dirname(__file__),
+                'qt_wheel_distinfo')
+        for proto in os.listdir(proto_dir):
+            src = os.path.join(proto_dir, proto)
+            dst = os.path.join(distinfo_dir, proto)
+
+            if proto == 'METADATA':
+                with open(src) as s:
+                    metadata = s.read()
+
+                metadata = metadata.replace('@RB_PACKAGE@', package_title)
+                metadata = metadata.replace('@RB_PACKAGE_NAME@',
+                        package_full_name)
+                metadata = metadata.replace('@RB_PACKAGE_REQUIRES@',
+                        package_requires)
+                metadata = metadata.replace('@RB_VERSION@', version_str)
+                metadata = metadata.replace('@RB_LICENSE@',
+                        "LGPL v3" if lgpl else "GPL v3")
+
+                with open(dst, 'w') as d:
+                    d.write(metadata)
+            elif proto == 'WHEEL':
+                with open(src) as s:
+                    wheel_data = s.read()
+
+                with open(dst, 'w') as d:
+                    d.write(wheel_data)
+                    d.write('Tag: {}\n'.format(tag))
+
+                    if build_tag:
+                        d.write('Build: {}\n'.format(build_tag))
+            elif proto.startswith('LICENSE.'):
+                if proto.endswith('.lgpl3' if lgpl else '.gpl3'):
+                    shutil.copy(src, os.path.join(distinfo_dir, 'LICENSE'))
+            else:
+                shutil.copy(src, dst)
+
+        # Create the wheel.  Each file is hashed as it is compressed and the
+        # RECORD file is written last.
+        verbose("Writing {0}".format(wheel_name))
+
+        writer = WheelWriter(wheel_path, buffer_size=buffer_size,
+                compress_jobs=compress_jobs)
+        writer.write_files(get_wheel_files(get_manifest()))
 
-    # Write the wheel's RECORD file.
-    verbose("Writing the RECORD file")
-    names = write_record_file(distinfo_dir)
+        writer.close(distinfo_dir + '/RECORD')
+    except BaseException:
+        # Don't leave an incomplete wheel.
+        if writer is not None:
+            writer.discard()
 
-    # Create the wheel.
-    verbose("Writing {0}".format(wheel_name))
-    create_wheel(wheel_path, names)
+        raise
+    finally:
+        set_manifest(False)
+        os.chdir(saved_cwd)
 
     # Tidy up.
-    os.chdir(saved_cwd)
     shutil.rmtree(wheel_name)
 
     verbose("Wheel build complete.")
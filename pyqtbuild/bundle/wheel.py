@@ -4,76 +4,523 @@
 
 
 import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import os
+import struct
+import time
 import zipfile
+import zlib
 
 from sipbuild import UserException
 
 
-def create_wheel(wheel_path, names):
-    """ Create the wheel from a list of file names. """
+# The default size of the buffer in which the contents of an entry are read.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
 
-    with zipfile.ZipFile(wheel_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-        for name in names:
-            zf.write(name)
+# The formats of the records of a zip file.
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4H3L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_ZIP64_END_RECORD = struct.Struct('<4sQ2H2L4Q')
+_ZIP64_END_LOCATOR = struct.Struct('<4sLQL')
 
+# The largest size or offset that doesn't need the zip64 extensions.
+_ZIP64_LIMIT = (1 << 31) - 1
 
-def unpack_wheel(wheel_path):
-    """ Unpack a wheel in the current directory. """
+# The versions of the zip specification needed to extract an entry.
+_DEFAULT_VERSION = 20
+_ZIP64_VERSION = 45
+
+# The size of the deflate window.  The end of the contents preceding a block
+# that is compressed independently is used as its dictionary.
+_WINDOW_SIZE = 32 * 1024
+
+# The empty final block that ends the deflated contents of an entry.
+_FINAL_BLOCK = b'\x03\x00'
+
+
+class WheelWriter:
+    """ Encapsulate a wheel that is written one entry at a time.  An entry may
+    be copied from another wheel without being decompressed and the RECORD
+    file is written last.
+    """
+
+    def __init__(self, wheel_path, buffer_size=None, compress_jobs=None):
+        """ Initialise the wheel.  buffer_size is the number of bytes of an
+        entry that are read (and compressed) at a time and bounds the memory
+        used.  compress_jobs is the number of blocks that are compressed
+        concurrently by write_files().
+        """
+
+        if buffer_size is None:
+            buffer_size = DEFAULT_BUFFER_SIZE
+
+        if compress_jobs is None:
+            compress_jobs = 1
+
+        self._buffer_size = buffer_size
+        self._compress_jobs = compress_jobs
+
+        try:
+            self._f = open(wheel_path, 'wb')
+        except OSError as e:
+            raise UserException("Unable to create '{0}'".format(wheel_path),
+                    detail=str(e))
+
+        self._wheel_path = wheel_path
+
+        self._entries = []
+        self._record = []
+
+    def close(self, record_name):
+        """ Write the RECORD file and the central directory and close the
+        wheel.
+        """
+
+        self._record.append('{0},,'.format(record_name))
+
+        zinfo = zipfile.ZipInfo(record_name, time.localtime()[:6])
+        zinfo.external_attr = 0o644 << 16
+
+        data = ('\n'.join(self._record) + '\n').encode('utf-8')
+        self._write_contents(zinfo, [data], len(data))
+
+        self._write_central_directory()
+
+        self._f.close()
+
+    def copy_entry(self, wheel_f, zinfo, record_line):
+        """ Copy an entry, and the line describing it in the RECORD file, from
+        another wheel without decompressing it.
+        """
+
+        # Skip the local header of the entry.
+        wheel_f.seek(zinfo.header_offset)
+        header = wheel_f.read(_LOCAL_HEADER.size)
+
+        if len(header) != _LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+            raise UserException(
+                    "The wheel entry '{0}' is corrupt".format(zinfo.filename))
+
+        name_len, extra_len = _LOCAL_HEADER.unpack(header)[-2:]
+        wheel_f.seek(name_len + extra_len, os.SEEK_CUR)
+
+        entry = zipfile.ZipInfo(zinfo.filename, zinfo.date_time)
+        entry.compress_type = zinfo.compress_type
+        entry.CRC = zinfo.CRC
+        entry.compress_size = zinfo.compress_size
+        entry.file_size = zinfo.file_size
+        entry.external_attr = zinfo.external_attr
+        entry.create_system = zinfo.create_system
+
+        self._write_local_header(entry)
+
+        remaining = entry.compress_size
+
+        while remaining > 0:
+            chunk = wheel_f.read(min(remaining, self._buffer_size))
+            if not chunk:
+                raise UserException(
+                        "The wheel entry '{0}' is truncated".format(
+                                zinfo.filename))
+
+            self._f.write(chunk)
+            remaining -= len(chunk)
+
+        self._entries.append(entry)
+        self._record.append(record_line)
+
+    def discard(self):
+        """ Close and remove an incomplete wheel. """
+
+        self._f.close()
+
+        try:
+            os.remove(self._wheel_path)
+        except OSError:
+            pass
+
+    def write_data(self, name, data):
+        """ Write an entry with some contents. """
+
+        zinfo = zipfile.ZipInfo(name, time.localtime()[:6])
+        zinfo.external_attr = 0o644 << 16
+
+        self._write_contents(zinfo, [data], len(data))
+
+    def write_file(self, name, path):
+        """ Write an entry with the contents of a file.  The file is read once,
+        a chunk at a time, to both compress and hash it.
+        """
+
+        zinfo = zipfile.ZipInfo.from_file(path, name, strict_timestamps=False)
+
+        with open(path, 'rb') as f:
+            chunks = iter(lambda: f.read(self._buffer_size), b'')
+            self._write_contents(zinfo, chunks, zinfo.file_size)
+
+    def write_files(self, files):
+        """ Write entries with the contents of a sequence of 2-tuples of the
+        name of an entry and the path name of its file.  Each file is read a
+        block at a time and the blocks (of any number of files) are compressed
+        concurrently.  The blocks are written in order, and are compressed in
+        the same way as by write_file(), so that the wheel is reproducable.
+        """
+
+        if self._compress_jobs == 1:
+            for name, path in files:
+                self.write_file(name, path)
+
+            return
+
+        with ThreadPoolExecutor(max_workers=self._compress_jobs) as executor:
+            # Limit the number of compressed blocks waiting to be written so
+            # that the memory used is bounded.
+            max_pending = 2 * self._compress_jobs
+            pending = deque()
+
+            def write_next():
+                entry, future, last = pending.popleft()
+                self._write_block(entry,
+                        None if future is None else future.result(), last)
+
+            try:
+                for name, path in files:
+                    zinfo = zipfile.ZipInfo.from_file(path, name,
+                            strict_timestamps=False)
+                    entry = _DeflatedEntry(zinfo, zinfo.file_size)
+
+                    with open(path, 'rb') as f:
+                        block = f.read(self._buffer_size)
+
+                        while True:
+                            # Read ahead so that the last block is known.
+                            if block:
+                                next_block = f.read(self._buffer_size)
+                            else:
+                                next_block = b''
+
+                            if block:
+                                future = executor.submit(_deflate_block,
+                                        block, entry.add_block(block))
+                            else:
+                                future = None
+
+                            if len(pending) == max_pending:
+                                write_next()
+
+                            pending.append((entry, future, not next_block))
+
+                            if not next_block:
+                                break
+
+                            block = next_block
+
+                while pending:
+                    write_next()
+            finally:
+                # Discard anything not written because of an exception.
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
+
+    def _add_entry(self, zinfo, digest):
+        """ Add an entry that has been written to the central directory and the
+        RECORD file.
+        """
+
+        self._entries.append(zinfo)
+        self._record.append(
+                '{0},sha256={1},{2}'.format(zinfo.filename,
+                        _encode_digest(digest), zinfo.file_size))
+
+    @staticmethod
+    def _encode_date_time(date_time):
+        """ Return a 2-tuple of the MS-DOS encoded time and date. """
+
+        year, month, day, hour, minute, second = date_time
+
+        return ((hour << 11) | (minute << 5) | (second // 2),
+                ((year - 1980) << 9) | (month << 5) | day)
+
+    @staticmethod
+    def _encode_name(name):
+        """ Return a 2-tuple of an encoded entry name and the flags that
+        describe the encoding.
+        """
+
+        try:
+            return name.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return name.encode('utf-8'), 0x800
+
+    def _write_block(self, entry, compressed, last):
+        """ Write the next compressed block (which may be None) of an entry.
+        A provisional local header is written before the first block and is
+        updated, and the entry added to the RECORD file, after the last block
+        when the sizes are known.
+        """
+
+        zinfo = entry.zinfo
+
+        if entry.zip64 is None:
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.CRC = 0
+            zinfo.compress_size = 0
+            zinfo.file_size = 0
+
+            entry.zip64 = entry.expected_size * 1.05 > _ZIP64_LIMIT
+            self._write_local_header(zinfo, entry.zip64)
+
+        if compressed is not None:
+            self._f.write(compressed)
+            entry.compress_size += len(compressed)
+
+        if not last:
+            return
+
+        self._f.write(_FINAL_BLOCK)
+        entry.compress_size += len(_FINAL_BLOCK)
+
+        if not entry.zip64 and (entry.file_size > _ZIP64_LIMIT or
+                entry.compress_size > _ZIP64_LIMIT):
+            raise UserException(
+                    "'{0}' unexpectedly needs the zip64 extensions".format(
+                            zinfo.filename))
+
+        zinfo.CRC = entry.crc
+        zinfo.compress_size = entry.compress_size
+        zinfo.file_size = entry.file_size
+
+        end = self._f.tell()
+        self._f.seek(zinfo.header_offset)
+        self._write_local_header(zinfo, entry.zip64)
+        self._f.seek(end)
+
+        self._add_entry(zinfo, entry.digest)
+
+    def _write_central_directory(self):
+        """ Write the central directory and the end of central directory
+        records.
+        """
+
+        start = self._f.tell()
+
+        for entry in self._entries:
+            name, flags = self._encode_name(entry.filename)
+
+            file_size = entry.file_size
+            compress_size = entry.compress_size
+            header_offset = entry.header_offset
+
+            zip64_values = []
+
+            if file_size > _ZIP64_LIMIT or compress_size > _ZIP64_LIMIT:
+                zip64_values.append(file_size)
+                zip64_values.append(compress_size)
+                file_size = compress_size = 0xffffffff
+
+            if header_offset > _ZIP64_LIMIT:
+                zip64_values.append(header_offset)
+                header_offset = 0xffffffff
+
+            if zip64_values:
+                extra = struct.pack('<2H{0}Q'.format(len(zip64_values)), 1,
+                        8 * len(zip64_values), *zip64_values)
+                version = _ZIP64_VERSION
+            else:
+                extra = b''
+                version = _DEFAULT_VERSION
+
+            dos_time, dos_date = self._encode_date_time(entry.date_time)
+
+            self._f.write(
+                    _CENTRAL_HEADER.pack(b'PK\x01\x02', version,
+                            entry.create_system, version, 0, flags,
+                            entry.compress_type, dos_time, dos_date,
+                            entry.CRC, compress_size, file_size, len(name),
+                            len(extra), 0, 0, 0, entry.external_attr,
+                            header_offset))
+            self._f.write(name)
+            self._f.write(extra)
+
+        end = self._f.tell()
+
+        nr_entries = len(self._entries)
+        size = end - start
+        offset = start
+
+        if nr_entries > 0xffff or size > _ZIP64_LIMIT or offset > _ZIP64_LIMIT:
+            self._f.write(
+                    _ZIP64_END_RECORD.pack(b'PK\x06\x06',
+                            _ZIP64_END_RECORD.size - 12, _ZIP64_VERSION,
+                            _ZIP64_VERSION, 0, 0, nr_entries, nr_entries, size,
+                            offset))
+            self._f.write(_ZIP64_END_LOCATOR.pack(b'PK\x06\x07', 0, end, 1))
+
+            nr_entries = min(nr_entries, 0xffff)
+            size = min(size, 0xffffffff)
+            offset = min(offset, 0xffffffff)
+
+        self._f.write(
+                _END_RECORD.pack(b'PK\x05\x06', 0, 0, nr_entries, nr_entries,
+                        size, offset, 0))
+
+    def _write_contents(self, zinfo, chunks, expected_size):
+        """ Write an entry with contents provided as a sequence of chunks and
+        add it to the RECORD file.  The expected size of the contents
+        determines if the zip64 extensions are needed.
+        """
+
+        entry = _DeflatedEntry(zinfo, expected_size)
+
+        for chunk in chunks:
+            if chunk:
+                self._write_block(entry,
+                        _deflate_block(chunk, entry.add_block(chunk)), False)
+
+        self._write_block(entry, None, True)
+
+    def _write_local_header(self, zinfo, zip64=None):
+        """ Write the local header of an entry at the current position.  If
+        zip64 is None then the zip64 extensions are used if the sizes of the
+        entry need them.
+        """
+
+        name, flags = self._encode_name(zinfo.filename)
+
+        file_size = zinfo.file_size
+        compress_size = zinfo.compress_size
+
+        if zip64 is None:
+            zip64 = (file_size > _ZIP64_LIMIT or compress_size > _ZIP64_LIMIT)
+
+        if zip64:
+            extra = struct.pack('<2H2Q', 1, 16, file_size, compress_size)
+            file_size = compress_size = 0xffffffff
+            version = _ZIP64_VERSION
+        else:
+            extra = b''
+            version = _DEFAULT_VERSION
+
+        dos_time, dos_date = self._encode_date_time(zinfo.date_time)
+
+        zinfo.header_offset = self._f.tell()
+
+        self._f.write(
+                _LOCAL_HEADER.pack(b'PK\x03\x04', version, flags,
+                        zinfo.compress_type, dos_time, dos_date, zinfo.CRC,
+                        compress_size, file_size, len(name), len(extra)))
+        self._f.write(name)
+        self._f.write(extra)
+
+
+def get_wheel_files(manifest):
+    """ Return a sorted list of 2-tuples of the name of a file in the wheel and
+    its path name for the contents of the current (staging) directory and any
+    manifest.  A staged file takes precedence over one in the manifest.
+    """
+
+    files = {} if manifest is None else dict(manifest)
+
+    for dirpath, dirnames, filenames in os.walk('.'):
+        for filename in filenames:
+            # This will result in a name with no leading '.'.
+            path = os.path.relpath(os.path.join(dirpath, filename))
+            files[path.replace(os.sep, '/')] = path
+
+    # Reproducable builds.
+    return sorted(files.items())
+
+
+def open_wheel(wheel_path):
+    """ Return a ZipFile for an existing wheel. """
 
     try:
-        zf = zipfile.ZipFile(wheel_path)
+        return zipfile.ZipFile(wheel_path)
     except FileNotFoundError:
         raise UserException("Unable to find '{0}'".format(wheel_path))
+    except zipfile.BadZipFile:
+        raise UserException("'{0}' is not a valid wheel".format(wheel_path))
 
-    for zi in zf.infolist():
-        zf.extract(zi)
-        attr = zi.external_attr >> 16
-        if attr:
-            os.chmod(zi.filename, attr)
 
+def read_record_file(zf, record_name):
+    """ Return a dict of the lines of the RECORD file of a wheel keyed by the
+    name of the file that each line describes.
+    """
+
+    record = {}
 
-def write_record_file(distinfo_dir):
-    """ Write the RECORD file for the contents of the current directory.
-    Return a list of relative file names that were recorded.
+    for line in zf.read(record_name).decode('utf-8').splitlines():
+        name = line.rsplit(',', 2)[0]
+        if name:
+            record[name] = line
+
+    return record
+
+
+class _DeflatedEntry:
+    """ Encapsulate the state of an entry whose contents are being deflated a
+    block at a time.
     """
 
-    record_path = os.path.join(distinfo_dir, 'RECORD')
-    try:
-        os.remove(record_path)
-    except FileNotFoundError:
-        pass
+    def __init__(self, zinfo, expected_size):
+        """ Initialise the entry.  The expected size of the contents
+        determines if the zip64 extensions are needed.
+        """
 
-    # Calculate the signatures of the files.
-    record = []
+        self.zinfo = zinfo
+        self.expected_size = expected_size
+        self.zip64 = None
 
-    for dirpath, dirnames, filenames in os.walk('.'):
-        # Reproducable builds.
-        dirnames.sort()
-        filenames.sort()
+        self.crc = 0
+        self.digest = hashlib.sha256()
+        self.file_size = 0
+        self.compress_size = 0
 
-        for filename in filenames:
-            # This will result in a name with no leading '.'.
-            name = os.path.relpath(os.path.join(dirpath, filename))
+        self._dictionary = b''
 
-            with open(name, 'rb') as f:
-                data = f.read()
+    def add_block(self, block):
+        """ Add the next block of the contents to the CRC, digest and size and
+        return the dictionary to compress it with.
+        """
+
+        self.crc = zlib.crc32(block, self.crc)
+        self.digest.update(block)
+        self.file_size += len(block)
+
+        dictionary = self._dictionary
+
+        if len(block) >= _WINDOW_SIZE:
+            self._dictionary = block[-_WINDOW_SIZE:]
+        else:
+            self._dictionary = (dictionary + block)[-_WINDOW_SIZE:]
+
+        return dictionary
+
+
+def _deflate_block(block, dictionary):
+    """ Return a block of contents compressed independently of any other block
+    as raw deflate data that isn't final.  dictionary is the end of the
+    contents that precede the block.  This may be called from a worker thread.
+    """
 
-            digest = base64.urlsafe_b64encode(
-                    hashlib.sha256(data).digest()).rstrip(b'=').decode('ascii')
-            record.append((name, digest, len(data)))
+    if dictionary:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                zlib.DEFLATED, -15)
 
-    # Write the file.
-    names = []
+    # A sync flush ends the block on a byte boundary so that the next block
+    # can be appended.
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
 
-    with open(record_path, 'w') as f:
-        for name, digest, nbytes in record:
-            name = name.replace(os.path.sep, '/')
-            f.write('{},sha256={},{}\n'.format(name, digest, nbytes))
-            names.append(name)
 
-        f.write('{},,\n'.format(record_path))
-        names.append(record_path)
+def _encode_digest(digest):
+    """ Return a SHA256 digest encoded as required by a RECORD file. """
 
-    return names
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b'=').decode(
+            'ascii')
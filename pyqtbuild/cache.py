@@ -0,0 +1,157 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+
+# The name of the sub-directory of the cache containing any state that is
+# shared by concurrent builds.
+_STATE_DIR = 'state'
+
+
+class BuildCache:
+    """ Encapsulate a persistent, on-disk cache of information that is
+    expensive to determine and that is shared by different builds.
+    """
+
+    def __init__(self, cache_dir):
+        """ Initialise the cache. """
+
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def clear(self):
+        """ Remove the contents of the cache. """
+
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    @staticmethod
+    def default_dir():
+        """ Return the name of the default cache directory for the current
+        user.
+        """
+
+        if sys.platform == 'win32':
+            base_dir = os.environ.get('LOCALAPPDATA')
+            if not base_dir:
+                base_dir = os.path.expanduser(
+                        os.path.join('~', 'AppData', 'Local'))
+        elif sys.platform == 'darwin':
+            base_dir = os.path.expanduser(
+                    os.path.join('~', 'Library', 'Caches'))
+        else:
+            base_dir = os.environ.get('XDG_CACHE_HOME')
+            if not base_dir:
+                base_dir = os.path.expanduser(os.path.join('~', '.cache'))
+
+        return os.path.join(base_dir, 'pyqtbuild')
+
+    def evict(self, max_size):
+        """ Remove the least recently used entries until the total size of the
+        cache is no more than a number of bytes.  Any state shared by
+        concurrent builds is not removed.
+        """
+
+        entries = []
+        total_size = 0
+
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            if dirpath == self.cache_dir and _STATE_DIR in dirnames:
+                dirnames.remove(_STATE_DIR)
+
+            for filename in filenames:
+                entry_path = os.path.join(dirpath, filename)
+
+                try:
+                    st = os.stat(entry_path)
+                except OSError:
+                    continue
+
+                entries.append((st.st_mtime, st.st_size, entry_path))
+                total_size += st.st_size
+
+        # Remove the oldest entries first.
+        entries.sort()
+
+        for _, size, entry_path in entries:
+            if total_size <= max_size:
+                break
+
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+
+            total_size -= size
+
+    def get(self, section, key):
+        """ Return the value of an entry in a section of the cache or None if
+        there is no such entry.
+        """
+
+        entry_path = self._entry_path(section, key)
+
+        try:
+            with open(entry_path) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            # A missing or corrupt entry is simply a cache miss.
+            return None
+
+        # Record the use of the entry so that it isn't evicted.
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        return value
+
+    @staticmethod
+    def key(*parts):
+        """ Return a key derived from a number of JSON serialisable parts. """
+
+        data = json.dumps(parts, sort_keys=True).encode('utf-8')
+
+        return hashlib.sha256(data).hexdigest()
+
+    def get_state_dir(self, name):
+        """ Return the name of a directory in which state that is shared by
+        concurrent builds may be kept.  The directory is not affected by
+        evicting entries.
+        """
+
+        return os.path.join(self.cache_dir, _STATE_DIR, name)
+
+    def set(self, section, key, value):
+        """ Set the JSON serialisable value of an entry in a section of the
+        cache.
+        """
+
+        entry_path = self._entry_path(section, key)
+        temp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+
+        # The cache is an optimisation so any errors are ignored.  The entry
+        # is written to a temporary file first so that a concurrent build
+        # never sees a partial entry.
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+            with open(temp_path, 'w') as f:
+                json.dump(value, f)
+
+            os.replace(temp_path, entry_path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _entry_path(self, section, key):
+        """ Return the path name of the file containing an entry. """
+
+        return os.path.join(self.cache_dir, section, key + '.json')
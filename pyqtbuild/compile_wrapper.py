@@ -0,0 +1,336 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+# This is run (as a script rather than as a module so that it doesn't depend
+# on how pyqtbuild was made importable) by the Makefiles generated by qmake to
+# wrap each invocation of the compiler.  It therefore only uses the standard
+# library.
+
+
+from argparse import ArgumentParser, REMAINDER
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# The extensions of the names of the source files of a translation unit.
+_SOURCE_EXTENSIONS = ('.c', '.cc', '.cpp', '.cxx', '.m', '.mm')
+
+# The assumed peak memory usage in bytes of compiling a translation unit that
+# hasn't been compiled before (and there is nothing else to go on).
+_DEFAULT_PEAK_RSS = 1024 * 1024 * 1024
+
+# The number of seconds to wait before checking again if a job can be started.
+_POLL_INTERVAL = 0.25
+
+
+class MemoryScheduler:
+    """ Encapsulate the admission of compiler jobs according to the memory
+    that is available and the peak memory previously used to compile each
+    translation unit.  The state is shared by all jobs through files in a
+    directory.
+    """
+
+    def __init__(self, state_dir):
+        """ Initialise the scheduler. """
+
+        self._state_dir = state_dir
+        self._history_path = os.path.join(state_dir, 'history.json')
+        self._jobs_path = os.path.join(state_dir, 'jobs.json')
+        self._lock_path = os.path.join(state_dir, 'lock')
+
+    def admit(self, unit):
+        """ Wait until there is enough memory available to compile a
+        translation unit.
+        """
+
+        while True:
+            with self._locked():
+                history = self._read_json(self._history_path)
+                budget, jobs = self._read_jobs()
+
+                estimate = history.get(unit)
+                if estimate is None:
+                    estimate = max(history.values(), default=_DEFAULT_PEAK_RSS)
+
+                # The budget is the memory that was available when nothing was
+                # being compiled.  This allows for jobs that have been admitted
+                # but haven't yet reached their peak.  The memory available now
+                # allows for other demands on the machine.
+                if jobs and budget is not None:
+                    available = self._get_available_memory()
+
+                    can_start = (sum(jobs.values()) + estimate <= budget and
+                            (available is None or estimate <= available))
+                else:
+                    if not jobs:
+                        budget = self._get_available_memory()
+
+                    can_start = True
+
+                if can_start:
+                    jobs[str(os.getpid())] = estimate
+                    self._write_jobs(budget, jobs)
+                    return
+
+            time.sleep(_POLL_INTERVAL)
+
+    def release(self, unit, peak_rss):
+        """ Release the memory reserved for a job and record the peak memory
+        used to compile a translation unit.
+        """
+
+        with self._locked():
+            budget, jobs = self._read_jobs()
+            jobs.pop(str(os.getpid()), None)
+            self._write_jobs(budget, jobs)
+
+            if peak_rss:
+                history = self._read_json(self._history_path)
+                history[unit] = peak_rss
+                self._write_json(self._history_path, history)
+
+    @staticmethod
+    def _get_available_memory():
+        """ Return the number of bytes of memory available to start new
+        processes or None if it is not known.
+        """
+
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+
+        return None
+
+    def _locked(self):
+        """ Return a context manager that holds the lock on the state. """
+
+        return _FileLock(self._lock_path)
+
+    def _read_jobs(self):
+        """ Return a 2-tuple of the memory budget and the dict of the memory
+        reserved by each running job, keyed by process id.  Jobs that are no
+        longer running are discarded.
+        """
+
+        state = self._read_json(self._jobs_path)
+        jobs = state.get('jobs', {})
+
+        for pid in list(jobs.keys()):
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                del jobs[pid]
+            except (OSError, ValueError):
+                pass
+
+        return state.get('budget'), jobs
+
+    @staticmethod
+    def _read_json(path):
+        """ Return the contents of a JSON file as a dict. """
+
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_jobs(self, budget, jobs):
+        """ Write the memory budget and the dict of running jobs. """
+
+        self._write_json(self._jobs_path, {'budget': budget, 'jobs': jobs})
+
+    @staticmethod
+    def _write_json(path, value):
+        """ Write a dict to a JSON file. """
+
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+        with open(temp_path, 'w') as f:
+            json.dump(value, f)
+
+        os.replace(temp_path, path)
+
+
+class _FileLock:
+    """ A context manager for an exclusive lock on a file. """
+
+    def __init__(self, path):
+        """ Initialise the lock. """
+
+        self._path = path
+        self._fd = None
+
+    def __enter__(self):
+        """ Acquire the lock. """
+
+        import fcntl
+
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ Release the lock. """
+
+        import fcntl
+
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def get_history_key(project_dir, source):
+    """ Return the key that identifies a translation unit in the history of
+    the peak memory used to compile it.  The history is shared by all projects
+    so the key includes the project's directory and the name of the module
+    (which is that of the current directory) as well as the source file.
+    """
+
+    module = os.path.basename(os.getcwd())
+    key = os.path.normpath(os.path.join(module, source))
+
+    if project_dir:
+        key = os.path.join(project_dir, key)
+
+    return key
+
+
+def get_translation_unit(args):
+    """ Return the path name of the source file of the translation unit being
+    compiled by a compiler command line or None if it doesn't compile a
+    translation unit.
+    """
+
+    if '-c' not in args:
+        return None
+
+    for arg in args:
+        if not arg.startswith('-') and arg.endswith(_SOURCE_EXTENSIONS):
+            return arg
+
+    return None
+
+
+def get_child_usage():
+    """ Return a 2-tuple of the CPU time in seconds used by all child
+    processes that have terminated and the peak memory in bytes used by any of
+    them.  (None, None) is returned if they are not known.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None, None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    peak_rss = usage.ru_maxrss
+
+    # macOS reports bytes rather than kilobytes.
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+
+    return usage.ru_utime + usage.ru_stime, peak_rss
+
+
+def write_report(report_dir, unit, wall_time, cpu_time, peak_rss):
+    """ Write the resources used to compile a translation unit to a report
+    directory.  The name of the module is that of the current directory.
+    """
+
+    module = os.path.basename(os.getcwd())
+
+    os.makedirs(report_dir, exist_ok=True)
+
+    report_path = os.path.join(report_dir,
+            '{0}-{1}.json'.format(module, unit))
+
+    with open(report_path, 'w') as f:
+        json.dump({'module': module, 'source': unit, 'wall_time': wall_time,
+                'cpu_time': cpu_time, 'peak_rss': peak_rss}, f)
+
+
+def main(argv):
+    """ Run a compiler and return its exit code. """
+
+    parser = ArgumentParser(prog='compile_wrapper')
+
+    parser.add_argument('--memory-state',
+            help="schedule compiler jobs according to the memory available "
+                    "using the state in DIR",
+            metavar="DIR")
+
+    parser.add_argument('--project',
+            help="the root directory DIR of the project being built",
+            metavar="DIR")
+
+    parser.add_argument('--report',
+            help="write the resources used to compile each source file to "
+                    "DIR",
+            metavar="DIR")
+
+    parser.add_argument('compiler', nargs=REMAINDER,
+            help="the compiler command line")
+
+    args = parser.parse_args(argv)
+
+    if not args.compiler:
+        parser.error("the compiler command line must be specified")
+
+    source = get_translation_unit(args.compiler)
+
+    if source is not None:
+        unit = os.path.basename(source)
+        history_key = get_history_key(args.project, source)
+    else:
+        unit = history_key = None
+
+    scheduler = None
+
+    if args.memory_state and unit is not None:
+        try:
+            os.makedirs(args.memory_state, exist_ok=True)
+            scheduler = MemoryScheduler(args.memory_state)
+            scheduler.admit(history_key)
+        except (ImportError, OSError):
+            # Scheduling is an optimisation so just run the compiler.
+            scheduler = None
+
+    start = time.monotonic()
+
+    try:
+        returncode = subprocess.call(args.compiler)
+    finally:
+        wall_time = time.monotonic() - start
+        cpu_time, peak_rss = get_child_usage()
+
+        if scheduler is not None:
+            try:
+                scheduler.release(history_key, peak_rss)
+            except OSError:
+                pass
+
+    # The report and the scheduling are optimisations so any errors are
+    # ignored.
+    if args.report and unit is not None and returncode == 0:
+        try:
+            write_report(args.report, unit, wall_time, cpu_time, peak_rss)
+        except OSError:
+            pass
+
+    return returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
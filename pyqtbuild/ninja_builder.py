@@ -0,0 +1,311 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+import os
+import shlex
+import sys
+
+from sipbuild import BuildableModule, UserException
+
+from .builder import QmakeBuilder
+from .installable import QmakeTargetInstallable
+
+
+class NinjaBuilder(QmakeBuilder):
+    """ A project builder that uses qmake to determine how each module is
+    compiled and linked and then uses ninja to build all the modules from a
+    single build graph.  It is experimental because the compiler and linker
+    command lines are taken from the Makefiles generated by qmake.
+    """
+
+    def apply_user_defaults(self, tool):
+        """ Set default values for user options that haven't been set yet. """
+
+        super().apply_user_defaults(tool)
+
+        # ninja runs commands directly rather than using a shell on Windows.
+        if self.project.py_platform == 'win32':
+            raise UserException("NinjaBuilder is not supported on Windows")
+
+        # The flags used by profile guided optimisation are passed to make.
+        if self.pgo:
+            raise UserException(
+                    "NinjaBuilder does not support profile guided "
+                    "optimisation")
+
+    def build_project(self, target_dir, *, wheel_tag=None):
+        """ Build the project. """
+
+        project = self.project
+
+        project.progress("NinjaBuilder is experimental")
+
+        # Determine the dependencies between the buildables before any file
+        # names are made relative.
+        subdir_depends = self._get_subdir_dependencies()
+
+        # Use qmake to generate the Makefiles from which the compiler and
+        # linker command lines are taken, but don't run make.
+        make = self.make
+        self.make = False
+
+        try:
+            super().build_project(target_dir, wheel_tag=wheel_tag)
+        finally:
+            self.make = make
+
+        project.progress("Generating build.ninja")
+
+        with self.build_trace.span("Generating build.ninja", 'ninja'):
+            self._write_build_ninja(subdir_depends)
+
+        # Run ninja, if requested, to generate the bindings.
+        if self.make:
+            project.progress("Compiling the project")
+
+            launcher_stats = self._get_launcher_stats()
+            self._remove_compile_report()
+
+            with self.build_trace.span("Running ninja", 'make'):
+                self._run_ninja()
+
+            self._report_launcher_stats(launcher_stats)
+            self._write_compile_report()
+
+            if self.verify_interpreters:
+                self._verify_interpreters()
+
+        return None
+
+    def install_project(self, target_dir, *, wheel_tag=None):
+        """ Install the project into a target directory. """
+
+        if self.install_method != 'make':
+            super().install_project(target_dir, wheel_tag=wheel_tag)
+            return
+
+        project = self.project
+
+        project.progress("Installing the project")
+
+        with self.build_trace.span("Installing the project", 'install'):
+            self._run_ninja('install')
+
+    @staticmethod
+    def _escape_path(path):
+        """ Return a path escaped for use in a ninja build statement. """
+
+        return path.replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+    def _generate_edges(self, buildable, edges, outputs):
+        """ Add the ninja build edges needed to build a module to a list and
+        return the list of the outputs that create the module.  The set of
+        outputs of all edges is updated.
+        """
+
+        project = self.project
+
+        makefile = os.path.join(buildable.build_dir, 'Makefile')
+        variables, rules = self._parse_makefile(makefile)
+
+        module_dir = os.path.relpath(buildable.build_dir, project.build_dir)
+
+        def build_path(path):
+            if os.path.isabs(path):
+                return path
+
+            return os.path.normpath(os.path.join(module_dir, path))
+
+        # The post-link copy of the target creates the extension module
+        # itself.
+        module_files = []
+
+        for installable in buildable.installables:
+            if isinstance(installable, QmakeTargetInstallable):
+                module_files.extend(installable.files)
+
+        # Walk the rules needed to create the target.
+        targets = self._expand(variables.get('TARGET', ''), variables).split()
+        module_targets = set(targets)
+        module_outputs = []
+        visited = set()
+
+        while targets:
+            target = targets.pop()
+
+            if target in visited:
+                continue
+
+            visited.add(target)
+
+            rule = rules.get(target)
+            if rule is None or not rule[1]:
+                continue
+
+            deps, commands = rule
+
+            # Only include dependencies that ninja will be able to find.  The
+            # dependencies of an object file on any other headers (eg. those of
+            # Qt) are found by ninja from the file written by the compiler.
+            inputs = []
+
+            for dep in deps:
+                if dep in rules and rules[dep][1]:
+                    targets.append(dep)
+                elif not os.path.exists(
+                        os.path.join(buildable.build_dir, dep)):
+                    continue
+
+                inputs.append(build_path(dep))
+
+            if target in module_targets:
+                implicit_outputs = [build_path(f) for f in module_files]
+            else:
+                implicit_outputs = []
+
+            output = build_path(target)
+            outputs.add(output)
+            outputs.update(implicit_outputs)
+
+            if target in module_targets:
+                module_outputs.append(output)
+                module_outputs.extend(implicit_outputs)
+
+            # qmake compiles each source file with a single command.
+            if target.endswith('.o') and len(commands) == 1:
+                rule = 'compile'
+            else:
+                rule = 'run'
+
+            edges.append((rule, output, implicit_outputs, inputs, module_dir,
+                    ' && '.join(commands)))
+
+        return module_outputs
+
+    def _run_ninja(self, *targets):
+        """ Run ninja on the project's build.ninja file. """
+
+        project = self.project
+
+        ninja = self._find_exe('ninja') or self._find_exe('ninja-build')
+        if ninja is None:
+            raise UserException("'ninja' could not be found on PATH")
+
+        args = [self._quote(ninja), '-C', self._quote(project.build_dir)]
+
+        if self.jobs:
+            args.append('-j')
+            args.append(str(self.jobs))
+
+        args.extend(targets)
+
+        project.run_command(args)
+
+    def _write_build_ninja(self, subdir_depends):
+        """ Write the build.ninja file for the project. """
+
+        project = self.project
+
+        module_edges = []
+        module_outputs = {}
+        outputs = set()
+
+        for buildable in project.buildables:
+            if isinstance(buildable, BuildableModule):
+                edges = []
+                module_outputs[buildable.name] = self._generate_edges(
+                        buildable, edges, outputs)
+                module_edges.append((buildable.name, edges))
+
+        lines = ['# Generated by pyqtbuild.', '',
+                'ninja_required_version = 1.3', '']
+
+        lines.append('rule run')
+        lines.append('  command = cd $dir && $cmd')
+        lines.append('  description = Building $out')
+        lines.append('')
+
+        # The compiler writes the dependencies of an object file on the
+        # headers it includes with names relative to the module's build
+        # directory rather than the directory that ninja is run from.
+        depfile_script = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), 'ninja_depfile.py')
+
+        lines.append('rule compile')
+        lines.append(
+                '  command = cd $dir && $cmd -MD -MF $depfile_name && {0} {1} '
+                        '$dir $depfile_name'.format(
+                                self._quote(sys.executable).replace('$', '$$'),
+                                self._quote(depfile_script).replace('$',
+                                        '$$')))
+        lines.append('  depfile = $out.d')
+        lines.append('  deps = gcc')
+        lines.append('  description = Compiling $out')
+        lines.append('')
+
+        lines.append('rule install')
+        lines.append('  command = $cmd')
+        lines.append('  description = Installing the project')
+        lines.append('  pool = console')
+        lines.append('')
+
+        for name, edges in module_edges:
+            # Make sure that the modules that a module depends on (eg. because
+            # it links against one of them) are built first.
+            order_only = []
+
+            for depend in subdir_depends.get(name, ()):
+                order_only.extend(module_outputs.get(depend, ()))
+
+            for (rule, output, implicit_outputs, inputs, module_dir,
+                    command) in edges:
+                line = 'build ' + self._escape_path(output)
+
+                if implicit_outputs:
+                    line += ' | ' + ' '.join(
+                            [self._escape_path(o) for o in implicit_outputs])
+
+                line += ': ' + rule
+
+                if inputs:
+                    line += ' ' + ' '.join(
+                            [self._escape_path(i) for i in inputs])
+
+                if order_only:
+                    line += ' || ' + ' '.join(
+                            [self._escape_path(o) for o in order_only])
+
+                lines.append(line)
+                lines.append(
+                        '  dir = ' +
+                                shlex.quote(module_dir).replace('$', '$$'))
+                lines.append('  cmd = ' + command.replace('$', '$$'))
+
+                if rule == 'compile':
+                    depfile_name = os.path.relpath(output, module_dir) + '.d'
+                    lines.append(
+                            '  depfile_name = ' +
+                                    shlex.quote(depfile_name).replace('$',
+                                            '$$'))
+
+                lines.append('')
+
+        # Installation is done by the Makefiles generated by qmake.
+        install_cmd = 'cd {0} && {1} install'.format(
+                shlex.quote(project.build_dir), self._find_make())
+
+        all_outputs = ' '.join(
+                [self._escape_path(o) for o in sorted(outputs)])
+
+        lines.append('build install: install | all')
+        lines.append('  cmd = ' + install_cmd.replace('$', '$$'))
+        lines.append('')
+
+        lines.append('build all: phony ' + all_outputs)
+        lines.append('')
+        lines.append('default all')
+
+        self._write_file(os.path.join(project.build_dir, 'build.ninja'),
+                '\n'.join(lines) + '\n')
@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+# This is run (as a script rather than as a module so that it doesn't depend
+# on how pyqtbuild was made importable) by the build.ninja file written by
+# NinjaBuilder after each source file has been compiled.  It therefore only
+# uses the standard library.
+
+
+import os
+import sys
+
+
+def parse_depfile(text):
+    """ Return the list of names in the text of a dependency file written by
+    the compiler.  A target name includes its trailing ':'.
+    """
+
+    names = []
+    name = ''
+    i = 0
+
+    while i < len(text):
+        ch = text[i]
+        i += 1
+
+        if ch == '\\' and i < len(text):
+            # Handle a continuation line or an escaped character.
+            if text[i] == '\n':
+                ch = ' '
+            elif text[i] in ' #\\':
+                name += text[i]
+                i += 1
+                continue
+        elif ch == '$' and text[i:i + 1] == '$':
+            i += 1
+
+        if ch.isspace():
+            if name:
+                names.append(name)
+                name = ''
+        else:
+            name += ch
+
+    if name:
+        names.append(name)
+
+    return names
+
+
+def rebase_depfile(depfile, module_dir):
+    """ Rewrite a dependency file written by the compiler in a module's build
+    directory so that the relative names are relative to the directory that
+    ninja is run from.
+    """
+
+    with open(depfile) as f:
+        names = parse_depfile(f.read())
+
+    rebased = []
+
+    for name in names:
+        colon = ':' if name.endswith(':') else ''
+        if colon:
+            name = name[:-1]
+
+        if name and not os.path.isabs(name):
+            name = os.path.normpath(os.path.join(module_dir, name))
+
+        rebased.append(
+                name.replace('$', '$$').replace(' ', '\\ ').replace('#',
+                        '\\#') + colon)
+
+    with open(depfile, 'w') as f:
+        f.write(' '.join(rebased) + '\n')
+
+
+def main(argv):
+    """ Rebase the dependency file named on the command line. """
+
+    if len(argv) != 2:
+        print("usage: ninja_depfile.py MODULE_DIR DEPFILE", file=sys.stderr)
+        return 2
+
+    module_dir, depfile = argv
+
+    try:
+        rebase_depfile(depfile, module_dir)
+    except OSError as e:
+        print("ninja_depfile.py: {0}".format(e), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,6 +3,7 @@
 # Copyright (c) 2024 Phil Thompson <phil@riverbankcomputing.com>
 
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import sys
 
@@ -177,6 +178,13 @@ class PyQtProject(Project):
                 Option('apple_universal2', option_type=bool,
                         help="build a universal2 project"))
 
+        options.append(
+                Option('config_tests', choices=['batch', 'parallel', 'serial'],
+                        default='serial',
+                        help="run the configuration tests as a single batch, "
+                                "in parallel or serially",
+                        metavar="MODE"))
+
         options.append(
                 Option('link_full_dll', option_type=bool,
                         help="on Windows link against the full Python DLL "
@@ -192,3 +200,95 @@ class PyQtProject(Project):
                 metavar="DIR", tools=['wheel']))
 
         return options
+
+    def update_buildable_bindings(self):
+        """ Update the list of bindings to ensure they are either buildable or
+        have been explicitly enabled.  This re-implementation will optionally
+        build the configuration tests of the bindings as a single batch or run
+        them in parallel.
+        """
+
+        if self.config_tests == 'serial':
+            super().update_buildable_bindings()
+            return
+
+        # Explicitly enabled bindings are assumed to be buildable.
+        if self.enable:
+            return
+
+        from .bindings import PyQtBindings
+
+        # Create the test programs.  Any bindings that re-implement
+        # is_buildable() are handled serially later on.
+        tests = {}
+
+        for b in self.bindings.values():
+            if not isinstance(b, PyQtBindings):
+                continue
+
+            if type(b).is_buildable is PyQtBindings.is_buildable:
+                test = b._create_test()
+                if test is not None:
+                    tests[b.name] = test
+
+        # Build and run the test programs.
+        results = {}
+
+        if tests:
+            nr_workers = self.builder.jobs
+            if not nr_workers:
+                nr_workers = os.cpu_count()
+
+            test_exes = {}
+
+            if self.config_tests == 'batch':
+                # Only build the tests whose outcome hasn't been cached.
+                uncached = []
+
+                for name, test in tests.items():
+                    bindings = self.bindings[name]
+
+                    if bindings._get_cached_test_output(test) is None:
+                        uncached.append(name)
+
+                if uncached:
+                    with self.builder.build_trace.span(
+                            "Building the configuration tests",
+                            'config-test'):
+                        test_exes = self.builder.build_executables(
+                                [tests[name][0] for name in uncached],
+                                fatal=False)
+                    test_exes = dict(zip(uncached, test_exes))
+
+            # Do this now so that the tests don't update the environment
+            # concurrently.
+            original_path = PyQtBindings._add_qt_bin_dir_to_path(self)
+
+            with ThreadPoolExecutor(max_workers=nr_workers) as pool:
+                for name, test in tests.items():
+                    bindings = self.bindings[name]
+
+                    if name in test_exes:
+                        results[name] = pool.submit(
+                                bindings._run_test_program, test,
+                                test_exes[name])
+                    else:
+                        results[name] = pool.submit(bindings._run_test, test)
+
+            if original_path is not None:
+                os.environ['PATH'] = original_path
+
+        # Handle the results in the original order so that they are the same
+        # as if the tests had been run serially.
+        for b in list(self.bindings.values()):
+            if b.name in tests:
+                buildable = b._evaluate_test(tests[b.name],
+                        results[b.name].result())
+            else:
+                buildable = b.is_buildable()
+
+            if not buildable:
+                del self.bindings[b.name]
+
+        if len(self.bindings) == 0:
+            raise UserException("There are no bindings that can be built")
@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+
+class BuildTrace:
+    """ Encapsulate a record of the time spent in the different phases of a
+    build that can be written as a Chrome trace event file.
+    """
+
+    def __init__(self):
+        """ Initialise the trace. """
+
+        self._events = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def add(self, name, category, start, end, *, lane=None, args=None):
+        """ Add a phase that started and ended at times returned by now().  A
+        phase is shown in the lane of the current thread unless another is
+        specified.
+        """
+
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round(start * 1000000),
+            'dur': round((end - start) * 1000000),
+            'pid': os.getpid(),
+            'tid': threading.get_ident() if lane is None else lane,
+        }
+
+        if args:
+            event['args'] = args
+
+        with self._lock:
+            self._events.append(event)
+
+    def now(self):
+        """ Return the number of seconds since the start of the trace. """
+
+        return time.perf_counter() - self._start
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """ A context manager that adds the phase that it encloses. """
+
+        start = self.now()
+
+        try:
+            yield
+        finally:
+            self.add(name, category, start, self.now(), args=args)
+
+    def write(self, fname):
+        """ Write the trace to a file. """
+
+        with self._lock:
+            events = sorted(self._events, key=lambda e: e['ts'])
+
+        with open(fname, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f,
+                    indent=1)
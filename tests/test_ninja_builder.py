@@ -0,0 +1,298 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+from sipbuild import BuildableModule, UserException
+
+from pyqtbuild import NinjaBuilder, QmakeBuilder
+from pyqtbuild.installable import QmakeTargetInstallable
+from pyqtbuild.ninja_depfile import parse_depfile, rebase_depfile
+
+
+# The Makefile generated by qmake for the QtCore module of a limited API build
+# of PyQt6 on Linux.
+_MAKEFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+        'QtCore.Makefile')
+
+
+class TestMakefileParser(unittest.TestCase):
+    """ Test the parsing of the Makefiles generated by qmake. """
+
+    def setUp(self):
+        """ Parse the captured Makefile. """
+
+        self.variables, self.rules = QmakeBuilder._parse_makefile(_MAKEFILE)
+
+    def test_continuation_lines(self):
+        """ Test that continuation lines are joined. """
+
+        self.assertEqual(self.variables['OBJECTS'].split(),
+                ['sipQtCorecmodule.o', 'sipQtCoreQObject.o'])
+
+    def test_variables(self):
+        """ Test that variables are parsed but not expanded. """
+
+        self.assertEqual(self.variables['CXX'], 'g++')
+        self.assertEqual(self.variables['TARGET'], 'libQtCore.so')
+        self.assertTrue(self.variables['CXXFLAGS'].endswith('$(DEFINES)'))
+
+    def test_escaped_dollar(self):
+        """ Test that an escaped '$' is unescaped when expanded. """
+
+        lflags = QmakeBuilder._expand(self.variables['LFLAGS'],
+                self.variables)
+
+        self.assertIn(r'-Wl,-rpath,\$ORIGIN/Qt6/lib', lflags)
+
+    def test_recursive_variable(self):
+        """ Test that a recursive definition doesn't loop forever. """
+
+        self.assertEqual(QmakeBuilder._expand('$(A)', {'A': 'a $(A)'}), 'a ')
+
+    def test_compile_rule(self):
+        """ Test that the rule to compile a source file is expanded. """
+
+        deps, commands = self.rules['sipQtCorecmodule.o']
+
+        self.assertEqual(deps, ['sipQtCorecmodule.cpp', 'sipAPIQtCore.h',
+                '/opt/Qt/6.5.0/gcc_64/include/QtCore/qglobal.h'])
+        self.assertEqual(len(commands), 1)
+        self.assertTrue(commands[0].startswith('g++ -c -pipe -O2'))
+        self.assertIn('-DQT_CORE_LIB', commands[0])
+        self.assertIn('-I/usr/include/python3.11', commands[0])
+        self.assertTrue(
+                commands[0].endswith(
+                        '-o sipQtCorecmodule.o sipQtCorecmodule.cpp'))
+
+    def test_link_rule(self):
+        """ Test that the rule to link the module is expanded. """
+
+        deps, commands = self.rules['libQtCore.so']
+
+        self.assertEqual(deps, ['sipQtCorecmodule.o', 'sipQtCoreQObject.o'])
+        self.assertEqual(commands[0], '(rm -f libQtCore.so || true)')
+        self.assertTrue(commands[1].startswith('g++ -Wl,--version-script'))
+        self.assertEqual(commands[2], 'cp -f libQtCore.so QtCore.abi3.so')
+
+    def test_silent_command(self):
+        """ Test that the '@' prefix of a command is removed. """
+
+        _, commands = self.rules['qmake']
+
+        self.assertEqual(commands,
+                ['/opt/Qt/6.5.0/gcc_64/bin/qmake -o Makefile QtCore.pro'])
+
+    def test_force(self):
+        """ Test that FORCE is removed from the dependencies of a rule. """
+
+        deps, _ = self.rules['install']
+
+        self.assertEqual(deps, ['install_target'])
+
+    def test_special_targets(self):
+        """ Test that special targets are ignored. """
+
+        self.assertNotIn('.SUFFIXES', self.rules)
+
+
+class TestBuildNinja(unittest.TestCase):
+    """ Test the generation of build.ninja from the captured Makefile. """
+
+    def setUp(self):
+        """ Create a build directory containing the module's Makefile and
+        sources.
+        """
+
+        self.build_dir = tempfile.mkdtemp()
+
+        project = SimpleNamespace(build_dir=self.build_dir, buildables=[],
+                py_platform='linux',
+                open_for_writing=lambda fname: open(fname, 'w'))
+
+        buildable = BuildableModule(project, 'QtCore', 'PyQt6.QtCore')
+        buildable.installables.append(
+                QmakeTargetInstallable('QtCore.abi3.so', 'PyQt6'))
+        project.buildables.append(buildable)
+
+        shutil.copy(_MAKEFILE, os.path.join(buildable.build_dir, 'Makefile'))
+
+        for fn in ('sipQtCorecmodule.cpp', 'sipQtCoreQObject.cpp',
+                'sipAPIQtCore.h'):
+            with open(os.path.join(buildable.build_dir, fn), 'w'):
+                pass
+
+        self.builder = NinjaBuilder(project)
+        self.buildable = buildable
+
+    def tearDown(self):
+        """ Remove the build directory. """
+
+        shutil.rmtree(self.build_dir)
+
+    def test_edges(self):
+        """ Test the build edges of a module. """
+
+        edges = []
+        outputs = set()
+
+        module_outputs = self.builder._generate_edges(self.buildable, edges,
+                outputs)
+
+        edges = {edge[1]: edge[:1] + edge[2:] for edge in edges}
+
+        self.assertEqual(set(edges),
+                {'QtCore/libQtCore.so', 'QtCore/sipQtCorecmodule.o',
+                        'QtCore/sipQtCoreQObject.o'})
+
+        # The post-link copy creates the extension module.
+        rule, implicit_outputs, inputs, module_dir, command = edges[
+                'QtCore/libQtCore.so']
+
+        self.assertEqual(rule, 'run')
+        self.assertEqual(implicit_outputs, ['QtCore/QtCore.abi3.so'])
+        self.assertEqual(sorted(inputs),
+                ['QtCore/sipQtCoreQObject.o', 'QtCore/sipQtCorecmodule.o'])
+        self.assertEqual(module_dir, 'QtCore')
+        self.assertTrue(command.endswith(' && cp -f libQtCore.so '
+                'QtCore.abi3.so'))
+
+        # Dependencies that don't exist (eg. the Qt headers) are left to the
+        # file written by the compiler.
+        rule, _, inputs, _, _ = edges['QtCore/sipQtCorecmodule.o']
+
+        self.assertEqual(rule, 'compile')
+        self.assertEqual(inputs,
+                ['QtCore/sipQtCorecmodule.cpp', 'QtCore/sipAPIQtCore.h'])
+
+        self.assertEqual(outputs,
+                {'QtCore/libQtCore.so', 'QtCore/QtCore.abi3.so',
+                        'QtCore/sipQtCorecmodule.o',
+                        'QtCore/sipQtCoreQObject.o'})
+
+        self.assertEqual(module_outputs,
+                ['QtCore/libQtCore.so', 'QtCore/QtCore.abi3.so'])
+
+    def test_build_ninja(self):
+        """ Test the contents of build.ninja. """
+
+        self.builder.spec = 'linux-g++'
+        self.builder._write_build_ninja({})
+
+        with open(os.path.join(self.build_dir, 'build.ninja')) as f:
+            lines = f.read().split('\n')
+
+        link_edge = ('build QtCore/libQtCore.so | QtCore/QtCore.abi3.so: run '
+                'QtCore/sipQtCorecmodule.o QtCore/sipQtCoreQObject.o')
+
+        self.assertIn(link_edge, lines)
+        self.assertIn('  dir = QtCore', lines)
+        self.assertIn('build all: phony QtCore/QtCore.abi3.so '
+                'QtCore/libQtCore.so QtCore/sipQtCoreQObject.o '
+                'QtCore/sipQtCorecmodule.o', lines)
+        self.assertEqual(lines[-2], 'default all')
+
+        # A '$' in a command must be escaped.
+        link = lines[lines.index(link_edge) + 2]
+
+        self.assertIn(r'-Wl,-rpath,\$$ORIGIN/Qt6/lib', link)
+
+        # The compiler writes the dependencies on the headers.
+        compile_edge = ('build QtCore/sipQtCorecmodule.o: compile '
+                'QtCore/sipQtCorecmodule.cpp QtCore/sipAPIQtCore.h')
+
+        self.assertIn(compile_edge, lines)
+        self.assertEqual(lines[lines.index(compile_edge) + 3],
+                '  depfile_name = sipQtCorecmodule.o.d')
+
+        rule = lines.index('rule compile')
+
+        self.assertTrue(
+                lines[rule + 1].startswith(
+                        '  command = cd $dir && $cmd -MD -MF $depfile_name '))
+        self.assertEqual(lines[rule + 2], '  depfile = $out.d')
+        self.assertEqual(lines[rule + 3], '  deps = gcc')
+
+    def test_module_dependencies(self):
+        """ Test that a module is built after the modules it depends on. """
+
+        project = self.builder.project
+
+        buildable = BuildableModule(project, 'QtGui', 'PyQt6.QtGui')
+        buildable.installables.append(
+                QmakeTargetInstallable('QtGui.abi3.so', 'PyQt6'))
+        project.buildables.append(buildable)
+
+        with open(_MAKEFILE) as f:
+            makefile = f.read()
+
+        with open(os.path.join(buildable.build_dir, 'Makefile'), 'w') as f:
+            f.write(makefile.replace('QtCore', 'QtGui'))
+
+        self.builder.spec = 'linux-g++'
+        self.builder._write_build_ninja({'QtGui': ['QtCore']})
+
+        with open(os.path.join(self.build_dir, 'build.ninja')) as f:
+            lines = f.read().split('\n')
+
+        self.assertIn('build QtGui/libQtGui.so | QtGui/QtGui.abi3.so: run '
+                'QtGui/sipQtGuicmodule.o QtGui/sipQtGuiQObject.o || '
+                'QtCore/libQtCore.so QtCore/QtCore.abi3.so', lines)
+        self.assertIn('build QtCore/libQtCore.so | QtCore/QtCore.abi3.so: run '
+                'QtCore/sipQtCorecmodule.o QtCore/sipQtCoreQObject.o', lines)
+
+    def test_make_restored(self):
+        """ Test that make is restored if the build fails. """
+
+        self.builder.make = True
+        self.builder.project.progress = lambda message: None
+
+        with mock.patch.object(QmakeBuilder, 'build_project',
+                side_effect=UserException("failed")):
+            with self.assertRaises(UserException):
+                self.builder.build_project(self.build_dir)
+
+        self.assertTrue(self.builder.make)
+
+
+class TestDepfile(unittest.TestCase):
+    """ Test the rebasing of the dependency files written by the compiler. """
+
+    def test_parse(self):
+        """ Test the parsing of a dependency file. """
+
+        self.assertEqual(
+                parse_depfile('a.o: a.cpp \\\n  my\\ dir/b.h $$c.h\n'),
+                ['a.o:', 'a.cpp', 'my dir/b.h', '$c.h'])
+
+    def test_rebase(self):
+        """ Test that relative names are made relative to the top-level build
+        directory.
+        """
+
+        fd, depfile = tempfile.mkstemp()
+
+        with os.fdopen(fd, 'w') as f:
+            f.write('a.o: a.cpp ./sipAPI.h \\\n /opt/Qt/include/qglobal.h \\\n'
+                    ' ../sip/my\\ file.h\n')
+
+        try:
+            rebase_depfile(depfile, 'QtCore')
+
+            with open(depfile) as f:
+                self.assertEqual(f.read(),
+                        'QtCore/a.o: QtCore/a.cpp QtCore/sipAPI.h '
+                        '/opt/Qt/include/qglobal.h sip/my\\ file.h\n')
+        finally:
+            os.remove(depfile)
+
+
+if __name__ == '__main__':
+    unittest.main()
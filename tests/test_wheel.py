@@ -0,0 +1,250 @@
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Copyright (c) 2025 Phil Thompson <phil@riverbankcomputing.com>
+
+
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import zipfile
+
+from pyqtbuild.bundle import wheel
+from pyqtbuild.bundle.wheel import WheelWriter
+
+
+# The fixed time used for the entries whose time would otherwise be the current
+# time.
+_NOW = (2025, 1, 2, 3, 4, 6, 0, 0, 0)
+
+
+class TestWheelWriter(unittest.TestCase):
+    """ Test the writing of wheels. """
+
+    def setUp(self):
+        """ Create a directory to contain the wheels and the files to add to
+        them.
+        """
+
+        self.temp_dir = tempfile.mkdtemp()
+
+        # Fix the time of the RECORD file so that wheels can be compared.
+        patcher = mock.patch.object(wheel.time, 'localtime',
+                return_value=_NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """ Remove the temporary directory. """
+
+        shutil.rmtree(self.temp_dir)
+
+    def test_write(self):
+        """ Test writing data and files. """
+
+        path = self._create_file('large', os.urandom(100000))
+
+        wheel_path = self._write_wheel(
+                lambda writer: (writer.write_data('pkg/data.txt', b'data'),
+                        writer.write_file('pkg/large.bin', path)))
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            self.assertEqual(zf.read('pkg/data.txt'), b'data')
+
+        self._check_wheel(wheel_path,
+                {'pkg/data.txt': b'data', 'pkg/large.bin': path})
+
+    def test_copy_entry(self):
+        """ Test copying both deflated and stored entries from another wheel.
+        """
+
+        source_path = os.path.join(self.temp_dir, 'source.whl')
+
+        with zipfile.ZipFile(source_path, 'w') as zf:
+            zf.writestr('pkg/deflated.txt', b'deflated' * 1000,
+                    compress_type=zipfile.ZIP_DEFLATED)
+            zf.writestr('pkg/stored.txt', b'stored',
+                    compress_type=zipfile.ZIP_STORED)
+
+        def copy_entries(writer):
+            with zipfile.ZipFile(source_path) as zf:
+                infos = zf.infolist()
+
+            with open(source_path, 'rb') as source_f:
+                for zinfo in infos:
+                    writer.copy_entry(source_f, zinfo,
+                            '{0},,'.format(zinfo.filename))
+
+        wheel_path = self._write_wheel(copy_entries)
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            self.assertIsNone(zf.testzip())
+
+            self.assertEqual(zf.getinfo('pkg/deflated.txt').compress_type,
+                    zipfile.ZIP_DEFLATED)
+            self.assertEqual(zf.read('pkg/deflated.txt'), b'deflated' * 1000)
+
+            self.assertEqual(zf.getinfo('pkg/stored.txt').compress_type,
+                    zipfile.ZIP_STORED)
+            self.assertEqual(zf.read('pkg/stored.txt'), b'stored')
+
+    def test_compress_jobs(self):
+        """ Test that compressing files concurrently produces the same wheel.
+        """
+
+        files = []
+
+        for i in range(10):
+            name = 'pkg/file{0}.bin'.format(i)
+            path = self._create_file(name, os.urandom(i * 30000))
+            files.append((name, path))
+
+        wheels = []
+
+        for compress_jobs in (1, 4):
+            wheel_path = self._write_wheel(
+                    lambda writer: writer.write_files(files),
+                    name='jobs{0}.whl'.format(compress_jobs),
+                    buffer_size=4096, compress_jobs=compress_jobs)
+
+            self._check_wheel(wheel_path, dict(files))
+
+            with open(wheel_path, 'rb') as f:
+                wheels.append(f.read())
+
+        self.assertEqual(wheels[0], wheels[1])
+
+    def test_compress_blocks(self):
+        """ Test that compressing the blocks of a large file concurrently
+        produces the same wheel.
+        """
+
+        # Repeat the data so that blocks refer to the contents preceding them.
+        data = os.urandom(20000) * 10
+        path = self._create_file('large', data)
+
+        wheels = []
+
+        for compress_jobs in (1, 4):
+            wheel_path = self._write_wheel(
+                    lambda writer: writer.write_files(
+                            [('pkg/large.bin', path)]),
+                    name='jobs{0}.whl'.format(compress_jobs),
+                    buffer_size=8192, compress_jobs=compress_jobs)
+
+            self._check_wheel(wheel_path, {'pkg/large.bin': data})
+
+            with open(wheel_path, 'rb') as f:
+                wheels.append(f.read())
+
+        self.assertEqual(wheels[0], wheels[1])
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            self.assertLess(zf.getinfo('pkg/large.bin').compress_size,
+                    len(data) // 2)
+
+    def test_non_ascii_name(self):
+        """ Test an entry whose name isn't ASCII. """
+
+        name = 'pkg/qml/Ünïcödé.qml'
+
+        wheel_path = self._write_wheel(
+                lambda writer: writer.write_data(name, b'contents'))
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            self.assertTrue(zf.getinfo(name).flag_bits & 0x800)
+            self.assertEqual(zf.read(name), b'contents')
+
+        self._check_wheel(wheel_path, {name: b'contents'})
+
+    def test_zip64(self):
+        """ Test the zip64 extensions. """
+
+        data = os.urandom(5000)
+        path = self._create_file('large', data)
+        contents = {'pkg/large{0}.bin'.format(i): data for i in range(3)}
+
+        def write_entries(writer):
+            writer.write_file('pkg/large0.bin', path)
+            writer.write_files([('pkg/large1.bin', path)])
+            writer.write_data('pkg/large2.bin', data)
+
+        with mock.patch.object(wheel, '_ZIP64_LIMIT', 1000):
+            wheel_path = self._write_wheel(write_entries, compress_jobs=2)
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            for zinfo in zf.infolist():
+                self.assertEqual(zinfo.extract_version, 45)
+
+        self._check_wheel(wheel_path, contents)
+
+    def test_discard(self):
+        """ Test that a discarded wheel is removed. """
+
+        wheel_path = os.path.join(self.temp_dir, 'discarded.whl')
+
+        writer = WheelWriter(wheel_path)
+        writer.write_data('pkg/data.txt', b'data')
+        writer.discard()
+
+        self.assertFalse(os.path.exists(wheel_path))
+
+    def _check_wheel(self, wheel_path, contents):
+        """ Check that a wheel is valid and has the expected contents and
+        RECORD file.  contents is a dict of the expected contents (or the name
+        of a file containing them) keyed by the name of the entry.
+        """
+
+        with zipfile.ZipFile(wheel_path) as zf:
+            self.assertIsNone(zf.testzip())
+
+            names = zf.namelist()
+            self.assertEqual(names[-1], 'pkg.dist-info/RECORD')
+            self.assertEqual(sorted(names[:-1]), sorted(contents))
+
+            record = zf.read('pkg.dist-info/RECORD').decode('utf-8')
+
+            for name, expected in contents.items():
+                if isinstance(expected, str):
+                    with open(expected, 'rb') as f:
+                        expected = f.read()
+
+                data = zf.read(name)
+                self.assertEqual(data, expected)
+
+                digest = base64.urlsafe_b64encode(
+                        hashlib.sha256(data).digest()).rstrip(b'=').decode(
+                                'ascii')
+                self.assertIn(
+                        '{0},sha256={1},{2}\n'.format(name, digest,
+                                len(data)),
+                        record)
+
+    def _create_file(self, name, contents):
+        """ Create a file and return its path name. """
+
+        path = os.path.join(self.temp_dir, 'files', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as f:
+            f.write(contents)
+
+        return path
+
+    def _write_wheel(self, write_entries, name='test.whl', **kwargs):
+        """ Write a wheel and return its path name. """
+
+        wheel_path = os.path.join(self.temp_dir, name)
+
+        writer = WheelWriter(wheel_path, **kwargs)
+        write_entries(writer)
+        writer.close('pkg.dist-info/RECORD')
+
+        return wheel_path
+
+
+if __name__ == '__main__':
+    unittest.main()